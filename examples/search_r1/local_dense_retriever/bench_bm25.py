@@ -0,0 +1,82 @@
+# Throughput comparison for BM25 retrieval: the old serial loop vs. batched Lucene search.
+#
+# "serial" reproduces the previous `_batch_search`: one `LuceneSearcher.search` per query and
+# one `json.loads(searcher.doc(...).raw())` per hit. "batched" is `BM25Retriever.batch_search`
+# (multi-threaded Lucene batch search + bulk, cached document loading), measured on a cold
+# and then a warm document cache.
+#
+# Usage:
+#   python bench_bm25.py --index_path $save_path/bm25 --queries_file queries.txt --topk 3
+
+import argparse
+import json
+import time
+
+from retrieval_server import BM25Retriever, Config
+
+
+def load_queries(args, searcher) -> list[str]:
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        # Fall back to passage titles, which behave like short entity-style questions.
+        queries = []
+        for docid in range(args.num_queries):
+            doc = searcher.doc(docid)
+            raw = doc.raw() if doc is not None else None
+            if raw:
+                queries.append(json.loads(raw)["contents"].split("\n")[0].strip('"'))
+    return queries[: args.num_queries]
+
+
+def serial_search(searcher, queries: list[str], topk: int):
+    results = []
+    for query in queries:
+        hits = searcher.search(query, topk)
+        results.append([json.loads(searcher.doc(hit.docid).raw())["contents"] for hit in hits])
+    return results
+
+
+def batched_search(retriever, queries: list[str], topk: int, batch_size: int):
+    results = []
+    for start in range(0, len(queries), batch_size):
+        results.extend(retriever.batch_search(queries[start : start + batch_size], num=topk))
+    return results
+
+
+def report(name: str, num_queries: int, elapsed: float):
+    print(f"{name:<24} {num_queries:>8} queries {elapsed:>8.2f}s {num_queries / elapsed:>10.1f} qps")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare serial vs batched BM25 retrieval throughput.")
+    parser.add_argument("--index_path", type=str, required=True, help="Pyserini Lucene index.")
+    parser.add_argument("--corpus_path", type=str, default=None, help="Corpus for indexes built without raw docs.")
+    parser.add_argument("--queries_file", type=str, default=None, help="One query per line.")
+    parser.add_argument("--num_queries", type=int, default=2048)
+    parser.add_argument("--topk", type=int, default=3)
+    parser.add_argument("--batch_size", type=int, default=512)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    config = Config(
+        retrieval_method="bm25",
+        index_path=args.index_path,
+        corpus_path=args.corpus_path or "",
+        retrieval_topk=args.topk,
+        bm25_threads=args.threads,
+    )
+    retriever = BM25Retriever(config)
+    queries = load_queries(args, retriever.searcher)
+    print(f"{len(queries)} queries, topk={args.topk}, batch_size={args.batch_size}, threads={args.threads}")
+
+    if retriever.contain_doc:
+        start = time.perf_counter()
+        serial_search(retriever.searcher, queries, args.topk)
+        report("serial (old loop)", len(queries), time.perf_counter() - start)
+
+    for name in ("batched (cold cache)", "batched (warm cache)"):
+        start = time.perf_counter()
+        batched_search(retriever, queries, args.topk, args.batch_size)
+        report(name, len(queries), time.perf_counter() - start)
@@ -0,0 +1,113 @@
+# Recall-vs-latency benchmark for compressed FAISS indexes against the flat baseline.
+#
+# Ground truth comes from the flat index; each candidate index is swept over its search
+# knob (nprobe for IVF, efSearch for HNSW) on CPU and reports recall@k plus latency for
+# single-query and batched search.
+#
+# Usage:
+#   python bench_index.py --flat_index_path $save_path/e5_Flat.index \
+#     --index_paths $save_path/e5_IVF4096_PQ64.index $save_path/e5_HNSW32.index \
+#     --query_emb queries.npy --topk 10
+#
+# Without --query_emb, queries are corpus vectors with Gaussian noise added (a rough
+# stand-in for real query embeddings; use real ones for final numbers).
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from index_utils import load_index, make_search_params
+
+
+def synthetic_queries(flat_index, num_queries: int, noise: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    ids = rng.choice(flat_index.ntotal, size=num_queries, replace=False)
+    queries = np.stack([flat_index.reconstruct(int(i)) for i in ids]).astype(np.float32)
+    queries += rng.normal(scale=noise, size=queries.shape).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row_found.tolist()) & set(row_truth.tolist())) for row_found, row_truth in zip(found, truth))
+    return hits / truth.size
+
+
+def time_search(index, queries: np.ndarray, topk: int, params, batch_size: int):
+    # single-query latency distribution
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query[None, :], k=topk, params=params)
+        latencies.append(time.perf_counter() - start)
+
+    # batched throughput, which is what the micro-batching server actually issues
+    found = []
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        _, idxs = index.search(queries[offset : offset + batch_size], k=topk, params=params)
+        found.append(idxs)
+    batch_qps = len(queries) / (time.perf_counter() - start)
+
+    latencies_ms = np.asarray(latencies) * 1000.0
+    return np.concatenate(found), latencies_ms, batch_qps
+
+
+def sweep_values(index, args):
+    if faiss.try_extract_index_ivf(index) is not None:
+        return "nprobe", args.nprobe
+    if hasattr(index, "hnsw"):
+        return "ef_search", args.ef_search
+    return None, [None]
+
+
+def main(args):
+    flat_index = faiss.read_index(args.flat_index_path)
+    if args.query_emb:
+        queries = np.load(args.query_emb).astype(np.float32)[: args.num_queries]
+    else:
+        queries = synthetic_queries(flat_index, args.num_queries, args.noise)
+
+    _, truth = flat_index.search(queries, k=args.topk)
+    _, flat_latency, flat_qps = time_search(flat_index, queries, args.topk, None, args.batch_size)
+
+    header = f"{'index':<40} {'knob':<14} {'recall@' + str(args.topk):>10} {'p50 ms':>9} {'p99 ms':>9} {'batch qps':>11}"
+    print(header)
+    print("-" * len(header))
+    print(
+        f"{'flat (baseline)':<40} {'-':<14} {1.0:>10.4f} {np.percentile(flat_latency, 50):>9.2f} "
+        f"{np.percentile(flat_latency, 99):>9.2f} {flat_qps:>11.1f}"
+    )
+
+    for index_path in args.index_paths:
+        index = load_index(index_path, use_mmap=args.faiss_mmap)
+        knob, values = sweep_values(index, args)
+        for value in values:
+            params = make_search_params(index, **{knob: value}) if knob else None
+            found, latency, qps = time_search(index, queries, args.topk, params, args.batch_size)
+            label = f"{knob}={value}" if knob else "-"
+            print(
+                f"{index_path.split('/')[-1]:<40} {label:<14} {recall_at_k(found, truth):>10.4f} "
+                f"{np.percentile(latency, 50):>9.2f} {np.percentile(latency, 99):>9.2f} {qps:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark recall vs latency of compressed FAISS indexes.")
+    parser.add_argument("--flat_index_path", type=str, required=True, help="Exact flat index used as ground truth.")
+    parser.add_argument("--index_paths", type=str, nargs="+", required=True, help="Candidate indexes to compare.")
+    parser.add_argument("--query_emb", type=str, default=None, help="Optional .npy of real query embeddings.")
+    parser.add_argument("--num_queries", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=0.05, help="Noise scale for synthetic queries.")
+    parser.add_argument("--topk", type=int, default=10)
+    parser.add_argument("--batch_size", type=int, default=512)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32, 64, 128])
+    parser.add_argument("--ef_search", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    parser.add_argument("--faiss_mmap", action="store_true", help="Memory-map candidate indexes like the server.")
+    parser.add_argument("--num_threads", type=int, default=None, help="OpenMP threads for FAISS.")
+    args = parser.parse_args()
+    if args.num_threads:
+        faiss.omp_set_num_threads(args.num_threads)
+    main(args)
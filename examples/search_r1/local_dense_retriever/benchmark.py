@@ -0,0 +1,241 @@
+# Load-test and benchmark harness for retrieval_server.py.
+#
+# 1) `prepare` writes a synthetic corpus, a flat FAISS index over it and a query trace, so
+#    retrieval-side changes can be measured locally without downloading wiki-18:
+#
+#      python benchmark.py prepare --output_dir /tmp/retrieval_bench --num_docs 200000
+#
+#    Index vectors are random unit vectors by default (same FAISS cost as real ones, no model
+#    needed); pass `--embed encoder --retriever_model <path>` to embed passages with the real encoder.
+#
+# 2) Start the server on the synthetic data (the `prepare` step prints the exact command).
+#
+# 3) `run` replays the trace against /retrieve with N concurrent clients and reports QPS,
+#    p50/p95/p99 latency, the server's merged batch-size distribution and encode / FAISS /
+#    doc-fetch time from GET /stats:
+#
+#      python benchmark.py run --trace /tmp/retrieval_bench/queries.jsonl --concurrency 64
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+
+def synthetic_vocab(size: int, rng) -> list[str]:
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    lengths = rng.integers(3, 10, size=size)
+    return ["".join(rng.choice(letters, size=length)) for length in lengths]
+
+
+def zipf_words(vocab: list[str], count: int, rng) -> list[str]:
+    ranks = np.minimum(rng.zipf(1.3, size=count), len(vocab)) - 1
+    return [vocab[rank] for rank in ranks]
+
+
+def prepare(args):
+    rng = np.random.default_rng(args.seed)
+    os.makedirs(args.output_dir, exist_ok=True)
+    vocab = synthetic_vocab(args.vocab_size, rng)
+
+    corpus_path = os.path.join(args.output_dir, "corpus.jsonl")
+    passages = []
+    with open(corpus_path, "w", encoding="utf-8") as f:
+        for doc_id in range(args.num_docs):
+            title = " ".join(zipf_words(vocab, 3, rng)).title()
+            text = " ".join(zipf_words(vocab, int(rng.integers(40, 120)), rng))
+            contents = f'"{title}"\n{text}'
+            passages.append(contents)
+            f.write(json.dumps({"id": str(doc_id), "contents": contents}) + "\n")
+    print(f"Wrote {args.num_docs} passages to {corpus_path}")
+
+    import faiss
+
+    if args.embed == "encoder":
+        from retrieval_server import Encoder
+
+        encoder = Encoder(args.retriever_name, args.retriever_model, "mean", 256, use_fp16=False)
+        vectors = np.concatenate(
+            [
+                encoder.encode(passages[start : start + 256], is_query=False)
+                for start in range(0, len(passages), 256)
+            ]
+        )
+    else:
+        vectors = rng.standard_normal((args.num_docs, args.dim), dtype=np.float32)
+        faiss.normalize_L2(vectors)
+
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    index_path = os.path.join(args.output_dir, "flat.index")
+    faiss.write_index(index, index_path)
+    print(f"Wrote flat index ({index.ntotal} x {index.d}) to {index_path}")
+
+    # Query trace: short keyword queries, a fraction repeated like multi-sample rollouts do.
+    trace_path = os.path.join(args.output_dir, "queries.jsonl")
+    queries: list[str] = []
+    with open(trace_path, "w", encoding="utf-8") as f:
+        for _ in range(args.num_queries):
+            if queries and rng.random() < args.repeat_ratio:
+                query = queries[int(rng.integers(len(queries)))]
+            else:
+                query = " ".join(zipf_words(vocab, int(rng.integers(2, 12)), rng))
+            queries.append(query)
+            f.write(json.dumps({"query": query, "topk": args.topk}) + "\n")
+    print(f"Wrote {args.num_queries} queries to {trace_path}")
+
+    print(
+        "\nStart the server with:\n"
+        f"  python retrieval_server.py --index_path {index_path} --corpus_path {corpus_path} "
+        f"--retriever_name {args.retriever_name} --retriever_model {args.retriever_model}"
+    )
+
+
+def load_trace(path: str, default_topk: int) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [{"query": record["query"], "topk": record.get("topk", default_topk)} for record in records]
+
+
+async def wait_until_ready(client, url: str, timeout: float):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = await client.get(f"{url}/ready")
+            if response.status_code == 200:
+                return
+            if response.json().get("status") == "failed":
+                raise RuntimeError(f"Server failed to start: {response.json().get('error')}")
+        except httpx.TransportError as exc:
+            # connection refused: the process is not listening yet
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{url} not reachable") from exc
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+        await asyncio.sleep(1.0)
+
+
+async def replay(args, trace: list[dict]) -> tuple[list[float], int, float]:
+    import httpx
+
+    total = args.num_requests or len(trace)
+    latencies: list[float] = []
+    errors = 0
+    next_index = 0
+
+    async def client_loop(client):
+        nonlocal next_index, errors
+        while next_index < total:
+            start_item = next_index
+            next_index += args.queries_per_request
+            items = [trace[(start_item + i) % len(trace)] for i in range(args.queries_per_request)]
+            payload = {
+                "queries": [item["query"] for item in items],
+                "topk": items[0]["topk"],
+                "return_scores": True,
+                "response_format": args.response_format,
+            }
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{args.url}/retrieve", json=payload)
+                response.raise_for_status()
+                response.json()
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        await wait_until_ready(client, args.url, args.ready_timeout)
+        await client.post(f"{args.url}/stats/reset")
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def fetch_stats(url: str) -> dict:
+    import httpx
+
+    response = httpx.get(f"{url}/stats", timeout=30.0)
+    response.raise_for_status()
+    return response.json()
+
+
+def report(args, latencies: list[float], errors: int, elapsed: float, stats: dict):
+    num_requests = len(latencies)
+    latencies_ms = np.asarray(latencies) * 1000.0 if latencies else np.zeros(1)
+    print(f"concurrency={args.concurrency} queries/request={args.queries_per_request}")
+    print(f"requests: {num_requests} ok, {errors} failed in {elapsed:.2f}s")
+    print(f"throughput: {num_requests / elapsed:.1f} req/s, {num_requests * args.queries_per_request / elapsed:.1f} queries/s")
+    print(
+        "latency ms: "
+        + " ".join(f"p{p}={np.percentile(latencies_ms, p):.1f}" for p in (50, 95, 99))
+        + f" max={latencies_ms.max():.1f}"
+    )
+
+    batch_sizes = {int(size): count for size, count in stats.get("batch_sizes", {}).items()}
+    if batch_sizes:
+        num_batches = sum(batch_sizes.values())
+        mean_size = sum(size * count for size, count in batch_sizes.items()) / num_batches
+        print(f"server batches: {num_batches}, mean size {mean_size:.1f}")
+        for size, count in sorted(batch_sizes.items()):
+            print(f"  {size:>5} queries: {count:>6} {'#' * max(1, round(40 * count / num_batches))}")
+
+    stages = stats.get("stages") or {}
+    stage_total = sum(entry["seconds"] for entry in stages.values()) or 1.0
+    print("server time by stage:")
+    for stage in ("encode", "search", "doc_fetch"):
+        entry = stages.get(stage)
+        if entry:
+            print(f"  {stage:<10} {entry['seconds']:>8.2f}s {100 * entry['seconds'] / stage_total:>5.1f}%  ({entry['calls']} calls)")
+
+    if stats.get("embedding_cache"):
+        cache = stats["embedding_cache"]
+        print(f"embedding cache: hit rate {cache['hit_rate']:.1%} ({cache['hits']} hits / {cache['misses']} misses)")
+
+
+def run(args):
+    trace = load_trace(args.trace, args.topk)
+    latencies, errors, elapsed = asyncio.run(replay(args, trace))
+    report(args, latencies, errors, elapsed, fetch_stats(args.url))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic data + load test for the local retrieval server.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prep = subparsers.add_parser("prepare", help="Generate a synthetic corpus, flat index and query trace.")
+    prep.add_argument("--output_dir", type=str, required=True)
+    prep.add_argument("--num_docs", type=int, default=100_000)
+    prep.add_argument("--vocab_size", type=int, default=50_000)
+    prep.add_argument("--dim", type=int, default=768, help="Vector size for --embed random (e5-base is 768).")
+    prep.add_argument("--embed", choices=["random", "encoder"], default="random")
+    prep.add_argument("--retriever_name", type=str, default="e5")
+    prep.add_argument("--retriever_model", type=str, default="intfloat/e5-base-v2")
+    prep.add_argument("--num_queries", type=int, default=20_000)
+    prep.add_argument("--repeat_ratio", type=float, default=0.3, help="Fraction of trace queries that repeat.")
+    prep.add_argument("--topk", type=int, default=3)
+    prep.add_argument("--seed", type=int, default=0)
+
+    bench = subparsers.add_parser("run", help="Replay a query trace against a running server.")
+    bench.add_argument("--url", type=str, default="http://127.0.0.1:8000")
+    bench.add_argument("--trace", type=str, required=True, help="JSONL with {'query': ..., 'topk': ...} per line.")
+    bench.add_argument("--concurrency", type=int, default=32, help="Number of concurrent closed-loop clients.")
+    bench.add_argument("--num_requests", type=int, default=None, help="Default: one pass over the trace.")
+    bench.add_argument("--queries_per_request", type=int, default=1)
+    bench.add_argument("--topk", type=int, default=3, help="Used when a trace line has no topk.")
+    bench.add_argument("--response_format", choices=["full", "compact"], default="full")
+    bench.add_argument("--timeout", type=float, default=60.0)
+    bench.add_argument("--ready_timeout", type=float, default=600.0, help="How long to wait for GET /ready.")
+
+    args = parser.parse_args()
+    if args.command == "prepare":
+        prepare(args)
+    else:
+        run(args)
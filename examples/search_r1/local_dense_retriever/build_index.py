@@ -0,0 +1,84 @@
+# Build a CPU-servable compressed FAISS index from the flat e5 index.
+#
+# A Flat wiki-18 index needs tens of GB of RAM and scans every vector per query. IVF-PQ
+# stores ~64 bytes per passage and probes a few inverted lists; HNSW keeps full vectors
+# but answers in logarithmic time. Both are served by retrieval_server.py with
+# --faiss_mmap plus per-request `nprobe` / `ef_search`.
+#
+# Usage:
+#   python build_index.py --flat_index_path $save_path/e5_Flat.index \
+#     --output_path $save_path/e5_IVF4096_PQ64.index --index_type ivf_pq --nlist 4096 --pq_m 64
+#   python build_index.py --flat_index_path $save_path/e5_Flat.index \
+#     --output_path $save_path/e5_HNSW32.index --index_type hnsw --hnsw_m 32
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+
+def iter_flat_vectors(flat_index, chunk_size: int):
+    for start in range(0, flat_index.ntotal, chunk_size):
+        num = min(chunk_size, flat_index.ntotal - start)
+        yield start, flat_index.reconstruct_n(start, num)
+
+
+def sample_training_vectors(flat_index, train_size: int, seed: int = 0) -> np.ndarray:
+    train_size = min(train_size, flat_index.ntotal)
+    rng = np.random.default_rng(seed)
+    ids = np.sort(rng.choice(flat_index.ntotal, size=train_size, replace=False))
+    return np.stack([flat_index.reconstruct(int(i)) for i in ids]).astype(np.float32)
+
+
+def factory_string(args) -> str:
+    if args.index_type == "ivf_pq":
+        return f"IVF{args.nlist},PQ{args.pq_m}x{args.pq_bits}"
+    if args.index_type == "ivf_flat":
+        return f"IVF{args.nlist},Flat"
+    if args.index_type == "hnsw":
+        return f"HNSW{args.hnsw_m},Flat"
+    if args.index_type == "factory":
+        return args.factory
+    raise ValueError(f"Unknown index type: {args.index_type}")
+
+
+def build_index(args):
+    flat_index = faiss.read_index(args.flat_index_path)
+    dim, metric = flat_index.d, flat_index.metric_type
+    spec = factory_string(args)
+    print(f"Building {spec} over {flat_index.ntotal} vectors (dim={dim}, metric={metric})")
+
+    index = faiss.index_factory(dim, spec, metric)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = args.ef_construction
+
+    if not index.is_trained:
+        start = time.time()
+        train_vectors = sample_training_vectors(flat_index, args.train_size)
+        index.train(train_vectors)
+        print(f"Trained on {len(train_vectors)} vectors in {time.time() - start:.1f}s")
+
+    start = time.time()
+    for offset, vectors in iter_flat_vectors(flat_index, args.chunk_size):
+        index.add(vectors)
+        print(f"Added {offset + len(vectors)}/{flat_index.ntotal} ({time.time() - start:.1f}s)", flush=True)
+
+    faiss.write_index(index, args.output_path)
+    print(f"Wrote {args.output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a flat FAISS index into IVF-PQ / HNSW variants.")
+    parser.add_argument("--flat_index_path", type=str, required=True, help="Existing flat index (e.g. e5_Flat.index).")
+    parser.add_argument("--output_path", type=str, required=True, help="Where to write the new index.")
+    parser.add_argument("--index_type", choices=["ivf_pq", "ivf_flat", "hnsw", "factory"], default="ivf_pq")
+    parser.add_argument("--factory", type=str, default=None, help="Raw faiss.index_factory string for --index_type factory.")
+    parser.add_argument("--nlist", type=int, default=4096, help="Number of IVF lists.")
+    parser.add_argument("--pq_m", type=int, default=64, help="PQ sub-quantizers (must divide the dimension).")
+    parser.add_argument("--pq_bits", type=int, default=8, help="Bits per PQ code.")
+    parser.add_argument("--hnsw_m", type=int, default=32, help="HNSW graph degree.")
+    parser.add_argument("--ef_construction", type=int, default=200, help="HNSW build-time beam width.")
+    parser.add_argument("--train_size", type=int, default=500_000, help="Vectors sampled to train IVF/PQ.")
+    parser.add_argument("--chunk_size", type=int, default=100_000, help="Vectors added per chunk.")
+    build_index(parser.parse_args())
@@ -0,0 +1,149 @@
+# Memory-mapped corpus store for the local retrieval server.
+#
+# Converts a JSONL corpus once into an offset-indexed blob:
+#   <store>/data.bin     every JSONL record, UTF-8 encoded, back to back
+#   <store>/offsets.npy  int64 array of length N + 1; record i is data[offsets[i]:offsets[i + 1]]
+#   <store>/meta.json    row count plus the source file size/mtime used to detect stale stores
+#
+# Usage:
+#   python corpus_store.py --corpus_path /root/Index/wiki-18.jsonl
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+STORE_FORMAT_VERSION = 1
+
+
+class UnknownDocumentError(ValueError):
+    """A requested document id is not a row of the store (or not an integer at all)."""
+
+
+class CorpusStore:
+    """Read-only corpus backed by `np.memmap`, with bulk document fetch."""
+
+    def __init__(self, store_path: str):
+        self.store_path = store_path
+        with open(os.path.join(store_path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus store format: {self.meta.get('format')!r}")
+
+        self.offsets = np.load(os.path.join(store_path, "offsets.npy"), mmap_mode="r")
+        data_path = os.path.join(store_path, "data.bin")
+        # np.memmap rejects empty files, and an empty corpus has nothing to fetch anyway.
+        self.data = np.memmap(data_path, dtype=np.uint8, mode="r") if os.path.getsize(data_path) else b""
+        # Slicing a memoryview is a zero-copy view; slicing the memmap builds an ndarray per record.
+        self._view = memoryview(self.data)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> dict:
+        return self.take([idx])[0]
+
+    def take(self, indices) -> list[dict]:
+        """
+        Return the documents for `indices` (any int array-like, e.g. a flattened FAISS id matrix).
+
+        Offsets are gathered in one NumPy call, and the records are copied out of the mapped blob in
+        a single `bytes.join` over zero-copy views, straight into one JSON array that is decoded with
+        a single `json.loads`. Negative ids (FAISS pads missing hits with -1) come back as empty
+        documents; ids past the end raise `UnknownDocumentError`.
+        """
+        try:
+            indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        except (TypeError, ValueError) as exc:
+            raise UnknownDocumentError(f"document ids must be integers: {exc}") from None
+        if indices.size == 0:
+            return []
+        if indices.max() >= len(self):
+            unknown = indices[indices >= len(self)][:10].tolist()
+            raise UnknownDocumentError(f"document ids out of range (store has {len(self)} documents): {unknown}")
+        if len(self) == 0:
+            return [{} for _ in range(indices.size)]
+
+        valid = indices >= 0
+        safe = np.where(valid, indices, 0)
+        starts = self.offsets[safe]
+        ends = self.offsets[safe + 1]
+        ends = np.where(valid, ends, starts)
+
+        view = self._view
+        records = [
+            view[start:end] if end > start else b"{}"
+            for start, end in zip(starts.tolist(), ends.tolist(), strict=True)
+        ]
+        return json.loads(b"[" + b",".join(records) + b"]")
+
+    @staticmethod
+    def default_store_path(corpus_path: str) -> str:
+        return f"{corpus_path}.store"
+
+    @staticmethod
+    def _source_signature(corpus_path: str) -> dict:
+        stat = os.stat(corpus_path)
+        return {"source_size": stat.st_size, "source_mtime": int(stat.st_mtime)}
+
+    @classmethod
+    def build(cls, corpus_path: str, store_path: str | None = None) -> "CorpusStore":
+        """Convert `corpus_path` (JSONL) into a store; each line is validated as JSON once."""
+        store_path = store_path or cls.default_store_path(corpus_path)
+        os.makedirs(store_path, exist_ok=True)
+        meta_path = os.path.join(store_path, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        offsets = [0]
+        with open(corpus_path, "rb") as src, open(os.path.join(store_path, "data.bin"), "wb") as dst:
+            for line in src:
+                line = line.strip()
+                if not line:
+                    continue
+                json.loads(line)
+                dst.write(line)
+                offsets.append(offsets[-1] + len(line))
+
+        np.save(os.path.join(store_path, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+        meta = {"format": STORE_FORMAT_VERSION, "num_docs": len(offsets) - 1, **cls._source_signature(corpus_path)}
+        # meta.json is written last, so an interrupted build is never mistaken for a complete one.
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return cls(store_path)
+
+    @classmethod
+    def is_fresh(cls, corpus_path: str, store_path: str) -> bool:
+        meta_path = os.path.join(store_path, "meta.json")
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != STORE_FORMAT_VERSION:
+            return False
+        if not os.path.exists(corpus_path):
+            # Only the converted store was shipped; trust it.
+            return True
+        signature = cls._source_signature(corpus_path)
+        return all(meta.get(key) == value for key, value in signature.items())
+
+    @classmethod
+    def open_or_build(cls, corpus_path: str, store_path: str | None = None) -> "CorpusStore":
+        """Open the store next to `corpus_path`, converting the JSONL first if it is missing or stale."""
+        store_path = store_path or cls.default_store_path(corpus_path)
+        if cls.is_fresh(corpus_path, store_path):
+            return cls(store_path)
+        return cls.build(corpus_path, store_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a JSONL corpus into a memory-mapped corpus store.")
+    parser.add_argument("--corpus_path", type=str, required=True, help="Local JSONL corpus file.")
+    parser.add_argument(
+        "--store_path", type=str, default=None, help="Output directory (default: <corpus_path>.store)."
+    )
+    args = parser.parse_args()
+
+    store = CorpusStore.build(args.corpus_path, args.store_path)
+    print(f"Wrote {len(store)} documents to {store.store_path}")
@@ -0,0 +1,70 @@
+# FAISS index loading helpers shared by retrieval_server.py and bench_index.py.
+
+import faiss
+
+
+def load_index(index_path: str, use_mmap: bool = False, nprobe: int | None = None, ef_search: int | None = None):
+    # Map the index from disk instead of copying it into RAM, so several processes can serve
+    # one index from the page cache. IO_FLAG_MMAP only covers IVF inverted lists; newer FAISS
+    # builds also have IO_FLAG_MMAP_IFC, which maps flat / HNSW vector storage as well.
+    io_flags = 0
+    if use_mmap:
+        io_flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    index = faiss.read_index(index_path, io_flags)
+    if nprobe is not None and faiss.try_extract_index_ivf(index) is not None:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    hnsw_index = _find_hnsw(index)
+    if ef_search is not None and hnsw_index is not None:
+        hnsw_index.hnsw.efSearch = ef_search
+    return index
+
+
+def _inner_index(index):
+    # The index a pre-transform (OPQ, PCA), id-map or refine wrapper searches, or None.
+    if isinstance(index, faiss.IndexPreTransform):
+        return faiss.downcast_index(index.index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexRefine):
+        return faiss.downcast_index(index.base_index)
+    return None
+
+
+def _find_hnsw(index):
+    index = faiss.downcast_index(index)
+    while index is not None and not isinstance(index, faiss.IndexHNSW):
+        index = _inner_index(index)
+    return index
+
+
+def _wrap_search_params(index, nprobe: int | None, ef_search: int | None):
+    # Search parameters are matched to the index type at every level, so a wrapper needs its own
+    # parameter object pointing at the one for the index it wraps.
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(nprobe=nprobe) if nprobe is not None else None
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search) if ef_search is not None else None
+    inner = _inner_index(index)
+    inner_params = _wrap_search_params(inner, nprobe, ef_search) if inner is not None else None
+    if inner_params is None:
+        return None
+    if isinstance(index, faiss.IndexPreTransform):
+        params = faiss.SearchParametersPreTransform(index_params=inner_params)
+    elif isinstance(index, faiss.IndexRefine):
+        params = faiss.IndexRefineSearchParameters(base_index_params=inner_params)
+    else:
+        # Id maps hand their parameters to the wrapped index unchanged.
+        return inner_params
+    # The struct only holds a pointer; keep the inner parameters alive with it.
+    params.referenced_objects = [inner_params]
+    return params
+
+
+def make_search_params(index, nprobe: int | None = None, ef_search: int | None = None):
+    """Per-call FAISS search parameters for IVF (`nprobe`) and HNSW (`efSearch`) indexes.
+
+    Pre-transform (OPQ, PCA), id-map and refine wrappers get matching nested parameters, so the
+    knob reaches the IVF or HNSW index inside them.
+    """
+    return _wrap_search_params(index, nprobe, ef_search)
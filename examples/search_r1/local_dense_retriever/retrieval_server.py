@@ -16,40 +16,88 @@
 # Adapted from https://github.com/PeterGriffinJin/Search-R1/blob/main/search_r1/search/retrieval_server.py
 
 import argparse
+import asyncio
 import json
+import threading
+import time
+import traceback
 import warnings
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Literal
 
-import datasets
 import faiss
 import numpy as np
 import torch
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from tqdm import tqdm
 from transformers import AutoModel, AutoTokenizer
 
+try:
+    import orjson
+except ImportError:  # optional: faster response serialization
+    orjson = None
+
+from corpus_store import CorpusStore, UnknownDocumentError
+from index_utils import load_index, make_search_params
+from worker_pool import WorkerDiedError, WorkerPool
+
 
 def load_corpus(corpus_path: str):
-    corpus = datasets.load_dataset("json", data_files=corpus_path, split="train", num_proc=4)
+    # Converted to a memory-mapped store on first use; later starts just mmap it.
+    if not CorpusStore.is_fresh(corpus_path, CorpusStore.default_store_path(corpus_path)):
+        warnings.warn(
+            f"Converting {corpus_path} into a corpus store; run corpus_store.py once ahead of time to skip this.",
+            stacklevel=2,
+        )
+    corpus = CorpusStore.open_or_build(corpus_path)
     return corpus
 
 
 def load_docs(corpus, doc_idxs):
-    results = [corpus[int(idx)] for idx in doc_idxs]
-    return results
+    return corpus.take(doc_idxs)
 
 
-def load_model(model_path: str, use_fp16: bool = False):
+def load_model(model_path: str, use_fp16: bool = False, device: str = "cuda", cpu_dtype: str = "fp32"):
     model = AutoModel.from_pretrained(model_path, trust_remote_code=True)
     model.eval()
-    model.cuda()
-    if use_fp16:
-        model = model.half()
+    if device == "cuda":
+        model.cuda()
+        if use_fp16:
+            model = model.half()
+    elif cpu_dtype == "bf16":
+        model = model.to(torch.bfloat16)
+    elif cpu_dtype == "int8":
+        # dynamic quantization: int8 Linear weights, activations quantized on the fly
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
     tokenizer = AutoTokenizer.from_pretrained(model_path, use_fast=True, trust_remote_code=True)
     return model, tokenizer
 
 
+def load_in_parallel(**loaders) -> tuple[dict, dict]:
+    """
+    Run independent zero-argument loaders on separate threads and return (results, seconds).
+
+    Index reads, corpus mmap and model loading are IO / native-code bound and release the GIL,
+    so the slowest one, not their sum, sets the startup time.
+    """
+
+    def timed(loader):
+        start = time.perf_counter()
+        result = loader()
+        return result, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=len(loaders), thread_name_prefix="load") as pool:
+        futures = {name: pool.submit(timed, loader) for name, loader in loaders.items()}
+        done = {name: future.result() for name, future in futures.items()}
+    return {name: result for name, (result, _) in done.items()}, {name: sec for name, (_, sec) in done.items()}
+
+
 def pooling(pooler_output, last_hidden_state, attention_mask=None, pooling_method="mean"):
     if pooling_method == "mean":
         last_hidden = last_hidden_state.masked_fill(~attention_mask[..., None].bool(), 0.0)
@@ -62,23 +110,95 @@ def pooling(pooler_output, last_hidden_state, attention_mask=None, pooling_metho
         raise NotImplementedError("Pooling method not implemented!")
 
 
+class StageTimer:
+    """Accumulated wall time per retrieval stage (encode / search / doc_fetch)."""
+
+    def __init__(self):
+        self._totals: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                entry = self._totals.setdefault(stage, [0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {stage: {"calls": calls, "seconds": seconds} for stage, (calls, seconds) in self._totals.items()}
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+
+class BucketStats:
+    """Encoder throughput per padded-length bucket (rounded up to a power of two)."""
+
+    def __init__(self):
+        self._buckets: dict[int, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, padded_length: int, num_sequences: int, num_tokens: int, seconds: float):
+        bucket = 1 << max(padded_length - 1, 0).bit_length()
+        with self._lock:
+            entry = self._buckets.setdefault(bucket, {"batches": 0, "sequences": 0, "tokens": 0, "seconds": 0.0})
+            entry["batches"] += 1
+            entry["sequences"] += num_sequences
+            entry["tokens"] += num_tokens
+            entry["seconds"] += seconds
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                f"<={bucket}": {
+                    **entry,
+                    "sequences_per_s": entry["sequences"] / entry["seconds"] if entry["seconds"] else 0.0,
+                    "tokens_per_s": entry["tokens"] / entry["seconds"] if entry["seconds"] else 0.0,
+                }
+                for bucket, entry in sorted(self._buckets.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
 class Encoder:
-    def __init__(self, model_name, model_path, pooling_method, max_length, use_fp16):
+    def __init__(
+        self,
+        model_name,
+        model_path,
+        pooling_method,
+        max_length,
+        use_fp16,
+        device: str | None = None,
+        cpu_dtype: str = "fp32",
+        bucket_batch_size: int = 128,
+    ):
         self.model_name = model_name
         self.model_path = model_path
         self.pooling_method = pooling_method
         self.max_length = max_length
         self.use_fp16 = use_fp16
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.cpu_dtype = cpu_dtype
+        self.bucket_batch_size = bucket_batch_size
+        self.bucket_stats = BucketStats()
 
-        self.model, self.tokenizer = load_model(model_path=model_path, use_fp16=use_fp16)
+        self.model, self.tokenizer = load_model(
+            model_path=model_path, use_fp16=use_fp16, device=self.device, cpu_dtype=cpu_dtype
+        )
         self.model.eval()
 
-    @torch.no_grad()
-    def encode(self, query_list: list[str], is_query=True) -> np.ndarray:
+    def add_prefix(self, query_list: list[str], is_query=True) -> list[str]:
         # processing query for different encoders
-        if isinstance(query_list, str):
-            query_list = [query_list]
-
         if "e5" in self.model_name.lower():
             if is_query:
                 query_list = [f"query: {query}" for query in query_list]
@@ -90,11 +210,55 @@ class Encoder:
                 query_list = [
                     f"Represent this sentence for searching relevant passages: {query}" for query in query_list
                 ]
+        return query_list
 
-        inputs = self.tokenizer(
-            query_list, max_length=self.max_length, padding=True, truncation=True, return_tensors="pt"
-        )
-        inputs = {k: v.cuda() for k, v in inputs.items()}
+    @torch.no_grad()
+    def encode(self, query_list: list[str], is_query=True) -> np.ndarray:
+        if isinstance(query_list, str):
+            query_list = [query_list]
+        return self.encode_texts(self.add_prefix(query_list, is_query=is_query))
+
+    @torch.no_grad()
+    def encode_texts(self, query_list: list[str]) -> np.ndarray:
+        """
+        Encode texts that already carry the model-specific prefix.
+
+        Texts are sorted by token length and split into buckets of `bucket_batch_size`, so each
+        forward pass only pads to the longest text in its own bucket instead of the whole batch.
+        """
+        if not query_list:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+
+        encoded = self.tokenizer(query_list, max_length=self.max_length, truncation=True)
+        lengths = np.asarray([len(ids) for ids in encoded["input_ids"]])
+        order = np.argsort(lengths, kind="stable")
+
+        query_emb = None
+        for start in range(0, len(order), self.bucket_batch_size):
+            bucket = order[start : start + self.bucket_batch_size]
+            features = [{key: encoded[key][i] for key in encoded.keys()} for i in bucket]
+            inputs = self.tokenizer.pad(features, padding=True, return_tensors="pt")
+
+            started = time.perf_counter()
+            bucket_emb = self._forward(inputs)
+            self.bucket_stats.record(
+                padded_length=inputs["input_ids"].shape[1],
+                num_sequences=len(bucket),
+                num_tokens=int(lengths[bucket].sum()),
+                seconds=time.perf_counter() - started,
+            )
+
+            if query_emb is None:
+                query_emb = np.empty((len(query_list), bucket_emb.shape[1]), dtype=np.float32)
+            query_emb[bucket] = bucket_emb
+
+        if self.device == "cuda":
+            torch.cuda.empty_cache()
+
+        return query_emb
+
+    def _forward(self, inputs) -> np.ndarray:
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
 
         if "T5" in type(self.model).__name__:
             # T5-based retrieval model
@@ -111,15 +275,87 @@ class Encoder:
             if "dpr" not in self.model_name.lower():
                 query_emb = torch.nn.functional.normalize(query_emb, dim=-1)
 
-        query_emb = query_emb.detach().cpu().numpy()
+        # bf16 has no numpy dtype, so upcast before leaving torch
+        query_emb = query_emb.detach().float().cpu().numpy()
         query_emb = query_emb.astype(np.float32, order="C")
 
         del inputs, output
-        torch.cuda.empty_cache()
-
         return query_emb
 
 
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+class EmbeddingCache:
+    """
+    Memory-bounded LRU of query embeddings in front of `Encoder.encode_texts`.
+
+    Keys are the prefixed, whitespace-normalized query texts. Each batch is split into
+    hits and misses; only the unique misses go through the encoder.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_size(key: str, emb: np.ndarray) -> int:
+        return emb.nbytes + len(key)
+
+    def _put(self, key: str, emb: np.ndarray):
+        if key in self._entries:
+            return
+        self._entries[key] = emb
+        self.nbytes += self._entry_size(key, emb)
+        while self.nbytes > self.max_bytes and self._entries:
+            old_key, old_emb = self._entries.popitem(last=False)
+            self.nbytes -= self._entry_size(old_key, old_emb)
+
+    def encode(self, texts: list[str], encode_fn) -> np.ndarray:
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            for text in texts:
+                emb = self._entries.get(text)
+                if emb is not None:
+                    self._entries.move_to_end(text)
+                    found[text] = emb
+            self.hits += sum(1 for text in texts if text in found)
+            self.misses += sum(1 for text in texts if text not in found)
+
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            missing_emb = encode_fn(missing)
+            with self._lock:
+                for text, emb in zip(missing, missing_emb, strict=True):
+                    emb = np.ascontiguousarray(emb)
+                    found[text] = emb
+                    self._put(text, emb)
+
+        return np.stack([found[text] for text in texts]).astype(np.float32, copy=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def reset_counters(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
 class BaseRetriever:
     def __init__(self, config):
         self.config = config
@@ -128,18 +364,58 @@ class BaseRetriever:
 
         self.index_path = config.index_path
         self.corpus_path = config.corpus_path
+        self.timer = StageTimer()
+        # component -> seconds it took to load, reported by /ready
+        self.load_seconds: dict[str, float] = {}
 
-    def _search(self, query: str, num: int, return_score: bool):
+    def _search(self, query: str, num: int, return_score: bool, search_params: dict | None = None):
         raise NotImplementedError
 
-    def _batch_search(self, query_list: list[str], num: int, return_score: bool):
+    def _batch_search_ids(self, query_list: list[str], num: int, search_params: dict | None = None):
         raise NotImplementedError
 
-    def search(self, query: str, num: int = None, return_score: bool = False):
-        return self._search(query, num, return_score)
+    def fetch_docs(self, doc_ids: list) -> list[dict]:
+        """Documents for ids returned by `batch_search_ids`, in order."""
+        raise NotImplementedError
 
-    def batch_search(self, query_list: list[str], num: int = None, return_score: bool = False):
-        return self._batch_search(query_list, num, return_score)
+    def _batch_search(self, query_list: list[str], num: int, return_score: bool, search_params: dict | None = None):
+        ids, scores = self._batch_search_ids(query_list, num, search_params)
+        # one bulk fetch for the whole batch, then chunk it back per query
+        flat_docs = self.fetch_docs([doc_id for row in ids for doc_id in row])
+        results = []
+        offset = 0
+        for row in ids:
+            results.append(flat_docs[offset : offset + len(row)])
+            offset += len(row)
+
+        if return_score:
+            return results, scores
+        else:
+            return results
+
+    def search(self, query: str, num: int = None, return_score: bool = False, search_params: dict | None = None):
+        return self._search(query, num, return_score, search_params)
+
+    def batch_search(
+        self, query_list: list[str], num: int = None, return_score: bool = False, search_params: dict | None = None
+    ):
+        return self._batch_search(query_list, num, return_score, search_params)
+
+    def batch_search_ids(self, query_list: list[str], num: int = None, search_params: dict | None = None):
+        """(doc ids, scores) per query without loading any documents."""
+        return self._batch_search_ids(query_list, num, search_params)
+
+    def run_jobs(self, jobs: list["SearchJob"]) -> list[bytes]:
+        """Search, fetch and serialize a merged batch in one call: the /retrieve JSON body of each job."""
+        results = search_jobs(self, jobs)
+        with self.timer.time("serialize"):
+            return [render_body(job, *result) for job, result in zip(jobs, results, strict=True)]
+
+    def stats(self) -> dict:
+        return {"stages": self.timer.summary()}
+
+    def reset_stats(self):
+        self.timer.reset()
 
 
 class BM25Retriever(BaseRetriever):
@@ -151,83 +427,159 @@ class BM25Retriever(BaseRetriever):
         self.contain_doc = self._check_contain_doc()
         if not self.contain_doc:
             self.corpus = load_corpus(self.corpus_path)
-        self.max_process_num = 8
+        self.max_process_num = config.bm25_threads
+        self.doc_fetcher = ThreadPoolExecutor(max_workers=self.max_process_num, thread_name_prefix="bm25-doc")
+
+        # docid -> parsed document, shared across requests (popular passages recur constantly)
+        self.doc_cache: OrderedDict[str, dict] = OrderedDict()
+        self.doc_cache_size = config.bm25_doc_cache_size
+        self._doc_cache_lock = threading.Lock()
 
     def _check_contain_doc(self):
         return self.searcher.doc(0).raw() is not None
 
-    def _search(self, query: str, num: int = None, return_score: bool = False):
+    @staticmethod
+    def _parse_raw_doc(raw: str) -> dict:
+        content = json.loads(raw)["contents"]
+        return {
+            "title": content.split("\n")[0].strip('"'),
+            "text": "\n".join(content.split("\n")[1:]),
+            "contents": content,
+        }
+
+    def _fetch_doc(self, docid: str) -> dict:
+        doc = self.searcher.doc(docid)
+        if doc is None:
+            raise UnknownDocumentError(f"unknown document id: {docid!r}")
+        return self._parse_raw_doc(doc.raw())
+
+    def _load_hit_docs(self, docids: list[str]) -> list[dict]:
+        """Resolve docids for a whole batch at once: cache hits first, then unique misses in parallel."""
+        if not self.contain_doc:
+            return load_docs(self.corpus, docids)
+
+        docs: dict[str, dict] = {}
+        with self._doc_cache_lock:
+            for docid in docids:
+                doc = self.doc_cache.get(docid)
+                if doc is not None:
+                    self.doc_cache.move_to_end(docid)
+                    docs[docid] = doc
+
+        missing = [docid for docid in dict.fromkeys(docids) if docid not in docs]
+        if missing:
+            fetched = list(self.doc_fetcher.map(self._fetch_doc, missing))
+            with self._doc_cache_lock:
+                for docid, doc in zip(missing, fetched, strict=True):
+                    docs[docid] = doc
+                    self.doc_cache[docid] = doc
+                while len(self.doc_cache) > self.doc_cache_size:
+                    self.doc_cache.popitem(last=False)
+
+        return [docs[docid] for docid in docids]
+
+    def _search(self, query: str, num: int = None, return_score: bool = False, search_params: dict | None = None):
+        results, scores = self._batch_search([query], num, True, search_params)
+        if return_score:
+            return results[0], scores[0]
+        else:
+            return results[0]
+
+    def fetch_docs(self, doc_ids: list) -> list[dict]:
+        with self.timer.time("doc_fetch"):
+            return self._load_hit_docs([str(doc_id) for doc_id in doc_ids])
+
+    def _batch_search_ids(self, query_list: list[str], num: int = None, search_params: dict | None = None):
+        if isinstance(query_list, str):
+            query_list = [query_list]
         if num is None:
             num = self.topk
-        hits = self.searcher.search(query, num)
-        if len(hits) < 1:
-            if return_score:
-                return [], []
-            else:
-                return []
-        scores = [hit.score for hit in hits]
-        if len(hits) < num:
-            warnings.warn("Not enough documents retrieved!", stacklevel=2)
-        else:
-            hits = hits[:num]
 
-        if self.contain_doc:
-            all_contents = [json.loads(self.searcher.doc(hit.docid).raw())["contents"] for hit in hits]
-            results = [
-                {
-                    "title": content.split("\n")[0].strip('"'),
-                    "text": "\n".join(content.split("\n")[1:]),
-                    "contents": content,
-                }
-                for content in all_contents
-            ]
-        else:
-            results = load_docs(self.corpus, [hit.docid for hit in hits])
+        # Lucene runs the whole batch on `max_process_num` threads inside the JVM.
+        qids = [str(i) for i in range(len(query_list))]
+        with self.timer.time("search"):
+            if len(query_list) == 1:
+                hits_by_qid = {qids[0]: self.searcher.search(query_list[0], num)}
+            else:
+                hits_by_qid = self.searcher.batch_search(query_list, qids, k=num, threads=self.max_process_num)
 
-        if return_score:
-            return results, scores
-        else:
-            return results
+        batch_hits = [list(hits_by_qid.get(qid, []))[:num] for qid in qids]
+        if any(len(hits) < num for hits in batch_hits):
+            warnings.warn("Not enough documents retrieved!", stacklevel=2)
 
-    def _batch_search(self, query_list: list[str], num: int = None, return_score: bool = False):
-        results = []
-        scores = []
-        for query in query_list:
-            item_result, item_score = self._search(query, num, True)
-            results.append(item_result)
-            scores.append(item_score)
-        if return_score:
-            return results, scores
-        else:
-            return results
+        ids = [[hit.docid for hit in hits] for hits in batch_hits]
+        scores = [[hit.score for hit in hits] for hits in batch_hits]
+        return ids, scores
 
 
 class DenseRetriever(BaseRetriever):
     def __init__(self, config):
         super().__init__(config)
-        self.index = faiss.read_index(self.index_path)
+        loaded, self.load_seconds = load_in_parallel(
+            index=self._load_index,
+            corpus=lambda: load_corpus(self.corpus_path),
+            encoder=lambda: Encoder(
+                model_name=self.retrieval_method,
+                model_path=config.retrieval_model_path,
+                pooling_method=config.retrieval_pooling_method,
+                max_length=config.retrieval_query_max_length,
+                use_fp16=config.retrieval_use_fp16,
+                device=config.retrieval_device,
+                cpu_dtype=config.retrieval_cpu_dtype,
+                bucket_batch_size=config.retrieval_encode_batch_size,
+            ),
+        )
+        self.index, self.corpus, self.encoder = loaded["index"], loaded["corpus"], loaded["encoder"]
+        self.topk = config.retrieval_topk
+        self.batch_size = config.retrieval_batch_size
+
+        cache_bytes = int(config.retrieval_embedding_cache_mb * 1024 * 1024)
+        self.embedding_cache = EmbeddingCache(max_bytes=cache_bytes) if cache_bytes > 0 else None
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache is not None else None,
+            "encoder_buckets": self.encoder.bucket_stats.summary(),
+        }
+
+    def reset_stats(self):
+        super().reset_stats()
+        if self.embedding_cache is not None:
+            self.embedding_cache.reset_counters()
+        self.encoder.bucket_stats.reset()
+
+    def _load_index(self):
+        config = self.config
+        index = load_index(
+            self.index_path, use_mmap=config.faiss_mmap, nprobe=config.faiss_nprobe, ef_search=config.faiss_ef_search
+        )
         if config.faiss_gpu:
             co = faiss.GpuMultipleClonerOptions()
             co.useFloat16 = True
             co.shard = True
-            self.index = faiss.index_cpu_to_all_gpus(self.index, co=co)
-
-        self.corpus = load_corpus(self.corpus_path)
-        self.encoder = Encoder(
-            model_name=self.retrieval_method,
-            model_path=config.retrieval_model_path,
-            pooling_method=config.retrieval_pooling_method,
-            max_length=config.retrieval_query_max_length,
-            use_fp16=config.retrieval_use_fp16,
-        )
-        self.topk = config.retrieval_topk
-        self.batch_size = config.retrieval_batch_size
+            index = faiss.index_cpu_to_all_gpus(index, co=co)
+        return index
 
-    def _search(self, query: str, num: int = None, return_score: bool = False):
+    def _encode_queries(self, query_list: list[str]) -> np.ndarray:
+        if isinstance(query_list, str):
+            query_list = [query_list]
+        if self.embedding_cache is None:
+            return self.encoder.encode(query_list)
+        texts = self.encoder.add_prefix([normalize_query(query) for query in query_list], is_query=True)
+        return self.embedding_cache.encode(texts, self.encoder.encode_texts)
+
+    def _search_params(self, search_params: dict | None):
+        if not search_params or self.config.faiss_gpu:
+            # GPU clones only honour the index-level defaults set at load time.
+            return None
+        return make_search_params(self.index, **search_params)
+
+    def _search(self, query: str, num: int = None, return_score: bool = False, search_params: dict | None = None):
         if num is None:
             num = self.topk
-        query_emb = self.encoder.encode(query)
-        scores, idxs = self.index.search(query_emb, k=num)
+        query_emb = self._encode_queries(query)
+        scores, idxs = self.index.search(query_emb, k=num, params=self._search_params(search_params))
         idxs = idxs[0]
         scores = scores[0]
         results = load_docs(self.corpus, idxs)
@@ -236,40 +588,39 @@ class DenseRetriever(BaseRetriever):
         else:
             return results
 
-    def _batch_search(self, query_list: list[str], num: int = None, return_score: bool = False):
+    def fetch_docs(self, doc_ids: list) -> list[dict]:
+        # ids are FAISS row numbers, i.e. line numbers in the corpus store (-1 pads missing hits)
+        with self.timer.time("doc_fetch"):
+            return load_docs(self.corpus, doc_ids)
+
+    def _batch_search_ids(self, query_list: list[str], num: int = None, search_params: dict | None = None):
         if isinstance(query_list, str):
             query_list = [query_list]
         if num is None:
             num = self.topk
+        params = self._search_params(search_params)
 
-        results = []
+        ids = []
         scores = []
-        for start_idx in tqdm(range(0, len(query_list), self.batch_size), desc="Retrieval process: "):
+        chunks = range(0, len(query_list), self.batch_size)
+        for start_idx in tqdm(chunks, desc="Retrieval process: ", disable=len(chunks) <= 1):
             query_batch = query_list[start_idx : start_idx + self.batch_size]
-            batch_emb = self.encoder.encode(query_batch)
-            batch_scores, batch_idxs = self.index.search(batch_emb, k=num)
-            batch_scores = batch_scores.tolist()
-            batch_idxs = batch_idxs.tolist()
-
-            # load_docs is not vectorized, but is a python list approach
-            flat_idxs = sum(batch_idxs, [])
-            batch_results = load_docs(self.corpus, flat_idxs)
-            # chunk them back
-            batch_results = [batch_results[i * num : (i + 1) * num] for i in range(len(batch_idxs))]
+            with self.timer.time("encode"):
+                batch_emb = self._encode_queries(query_batch)
+            with self.timer.time("search"):
+                batch_scores, batch_idxs = self.index.search(batch_emb, k=num, params=params)
 
-            results.extend(batch_results)
-            scores.extend(batch_scores)
+            ids.extend(batch_idxs.tolist())
+            scores.extend(batch_scores.tolist())
 
-            del batch_emb, batch_scores, batch_idxs, query_batch, flat_idxs, batch_results
-            torch.cuda.empty_cache()
+            del batch_emb, batch_scores, batch_idxs, query_batch
 
-        if return_score:
-            return results, scores
-        else:
-            return results
+        return ids, scores
 
 
 def get_retriever(config):
+    if config.num_workers > 1:
+        return WorkerPool(config, config.num_workers, threads_per_worker=config.worker_threads)
     if config.retrieval_method == "bm25":
         return BM25Retriever(config)
     else:
@@ -301,6 +652,18 @@ class Config:
         retrieval_query_max_length: int = 256,
         retrieval_use_fp16: bool = False,
         retrieval_batch_size: int = 128,
+        retrieval_batch_wait_ms: float = 5.0,
+        retrieval_embedding_cache_mb: float = 256.0,
+        faiss_mmap: bool = False,
+        faiss_nprobe: int | None = None,
+        faiss_ef_search: int | None = None,
+        bm25_threads: int = 8,
+        bm25_doc_cache_size: int = 100_000,
+        retrieval_device: str | None = None,
+        retrieval_cpu_dtype: str = "fp32",
+        retrieval_encode_batch_size: int = 128,
+        num_workers: int = 1,
+        worker_threads: int | None = None,
     ):
         self.retrieval_method = retrieval_method
         self.retrieval_topk = retrieval_topk
@@ -314,19 +677,294 @@ class Config:
         self.retrieval_query_max_length = retrieval_query_max_length
         self.retrieval_use_fp16 = retrieval_use_fp16
         self.retrieval_batch_size = retrieval_batch_size
+        self.retrieval_batch_wait_ms = retrieval_batch_wait_ms
+        self.retrieval_embedding_cache_mb = retrieval_embedding_cache_mb
+        self.faiss_mmap = faiss_mmap
+        self.faiss_nprobe = faiss_nprobe
+        self.faiss_ef_search = faiss_ef_search
+        self.bm25_threads = bm25_threads
+        self.bm25_doc_cache_size = bm25_doc_cache_size
+        self.retrieval_device = retrieval_device
+        self.retrieval_cpu_dtype = retrieval_cpu_dtype
+        self.retrieval_encode_batch_size = retrieval_encode_batch_size
+        self.num_workers = num_workers
+        self.worker_threads = worker_threads
+
+
+def dump_json(content) -> bytes:
+    """JSON bytes as FastAPI's JSONResponse renders them, via orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+@dataclass
+class SearchJob:
+    """One /retrieve request inside a merged batch; plain data, so it can be sent to a worker process."""
+
+    queries: list[str]
+    topk: int
+    search_params: dict | None = None
+    response_format: str = "full"
+    return_scores: bool = False
+    include_contents: bool = False
+
+    @property
+    def with_docs(self) -> bool:
+        # compact responses only need documents when the client asked for their contents
+        return self.response_format != "compact" or self.include_contents
+
+
+def search_jobs(retriever, jobs: list[SearchJob]) -> list[tuple[list, list, list | None]]:
+    """(ids, scores, docs) per job; docs is None for jobs that do not want documents."""
+    # Requests with different search knobs (nprobe/efSearch) cannot share one FAISS call.
+    groups: dict[tuple, list[int]] = {}
+    for i, job in enumerate(jobs):
+        groups.setdefault(tuple(sorted((job.search_params or {}).items())), []).append(i)
+
+    ids: list = [None] * len(jobs)
+    scores: list = [None] * len(jobs)
+    for key, members in groups.items():
+        queries = [query for i in members for query in jobs[i].queries]
+        topk = max(jobs[i].topk for i in members)
+        group_ids, group_scores = retriever.batch_search_ids(
+            query_list=queries, num=topk, search_params=dict(key) or None
+        )
+        # Split the merged batch back out; hits are sorted, so trimming keeps each request's top-k.
+        offset = 0
+        for i in members:
+            end, job_topk = offset + len(jobs[i].queries), jobs[i].topk
+            ids[i] = [row[:job_topk] for row in group_ids[offset:end]]
+            scores[i] = [row[:job_topk] for row in group_scores[offset:end]]
+            offset = end
+
+    # One bulk document fetch for the jobs that want documents (compact ones may not).
+    wanted = [i for i, job in enumerate(jobs) if job.with_docs]
+    flat_ids = [doc_id for i in wanted for row in ids[i] for doc_id in row]
+    flat_docs = retriever.fetch_docs(flat_ids) if flat_ids else []
+    docs: list = [None] * len(jobs)
+    offset = 0
+    for i in wanted:
+        docs[i] = []
+        for row in ids[i]:
+            docs[i].append(flat_docs[offset : offset + len(row)])
+            offset += len(row)
+    return list(zip(ids, scores, docs))
+
+
+def render_body(job: SearchJob, ids: list, scores: list, docs: list | None) -> bytes:
+    """The /retrieve JSON body for one job."""
+    if job.response_format == "compact":
+        body = {"ids": ids, "scores": scores}
+        if job.include_contents:
+            body["contents"] = [[doc.get("contents", "") for doc in row] for row in docs]
+        return dump_json(body)
+
+    resp = []
+    for i, single_result in enumerate(docs):
+        if job.return_scores:
+            # If scores are returned, combine them with results
+            combined = [{"document": doc, "score": score} for doc, score in zip(single_result, scores[i], strict=True)]
+            resp.append(combined)
+        else:
+            resp.append(single_result)
+    return dump_json({"result": resp})
+
+
+@dataclass
+class PendingRequest:
+    job: SearchJob
+    future: asyncio.Future = field(repr=False)
+
+
+class BatchScheduler:
+    """
+    Merge concurrent requests into one encoder forward pass and one index search.
+
+    Requests are queued and drained into a batch until `max_batch_size` queries are
+    collected or `max_wait_ms` has passed since the first one arrived. The batch runs
+    with the largest requested topk, and each request gets its own slice back.
+
+    At most `num_workers` batches are in flight, each on its own executor thread. With the
+    in-process retriever that is one (encoder/FAISS calls never contend with each other); with a
+    `WorkerPool` every worker process gets a batch, and requests arriving while all of them are
+    busy pile up in the queue and are merged into the next, larger batch.
+    """
+
+    def __init__(self, retriever, max_batch_size: int, max_wait_ms: float, num_workers: int = 1):
+        self.retriever = retriever
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.num_workers = num_workers
+        self.queue: asyncio.Queue[PendingRequest] = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="retrieval")
+        self._task = None
+        self._in_flight: set[asyncio.Task] = set()
+        # number of queries per dispatched batch -> count
+        self.batch_sizes: Counter[int] = Counter()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in [self._task, *self._in_flight]:
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, job: SearchJob) -> bytes:
+        """Return the JSON body answering `job`."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(PendingRequest(job=job, future=future))
+        return await future
+
+    async def _collect(self) -> list[PendingRequest]:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        num_queries = len(batch[0].job.queries)
+        deadline = loop.time() + self.max_wait
+
+        while num_queries < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(request)
+            num_queries += len(request.job.queries)
+        return batch
+
+    def _search(self, batch: list[PendingRequest]) -> list[bytes]:
+        # With a WorkerPool, search, document fetch and JSON encoding all happen in one worker call.
+        return self.retriever.run_jobs([request.job for request in batch])
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.num_workers)
+        while True:
+            # Wait for a free worker before collecting, so a busy server builds bigger batches.
+            await slots.acquire()
+            batch = await self._collect()
+            self.batch_sizes[sum(len(request.job.queries) for request in batch)] += 1
+            task = asyncio.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _dispatch(self, batch: list[PendingRequest]):
+        loop = asyncio.get_running_loop()
+        try:
+            bodies = await loop.run_in_executor(self.executor, self._search, batch)
+        except Exception as exc:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(exc)
+            return
+
+        for request, body in zip(batch, bodies, strict=True):
+            if not request.future.done():
+                request.future.set_result(body)
 
 
 class QueryRequest(BaseModel):
     queries: list[str]
     topk: int | None = None
     return_scores: bool = False
+    nprobe: int | None = None  # IVF indexes: inverted lists probed per query
+    ef_search: int | None = None  # HNSW indexes: search beam width
+    # "compact": {"ids", "scores"} only, documents resolved by the client (see POST /docs)
+    response_format: Literal["full", "compact"] = "full"
+    include_contents: bool = False  # compact only: also return each passage's `contents` string
+
+
+class DocsRequest(BaseModel):
+    ids: list[int | str]
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by orjson when installed, skipping FastAPI's per-field encoding pass."""
+
+    def render(self, content) -> bytes:
+        return dump_json(content)
+
+
+# Set once the background load in `lifespan` finishes; until then /retrieve answers 503.
+retriever = None
+scheduler = None
+startup_error = None
+startup_seconds = None
+
+
+async def load_retriever():
+    global retriever, scheduler, startup_error, startup_seconds
+    start = time.perf_counter()
+    try:
+        loaded = await asyncio.to_thread(get_retriever, config)
+    except Exception as exc:
+        startup_error = f"{type(exc).__name__}: {exc}"
+        traceback.print_exc()
+        return
+    startup_seconds = time.perf_counter() - start
+
+    retriever = loaded
+    scheduler = BatchScheduler(
+        retriever,
+        max_batch_size=config.retrieval_batch_size,
+        max_wait_ms=config.retrieval_batch_wait_ms,
+        num_workers=config.num_workers,
+    )
+    scheduler.start()
+    breakdown = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in retriever.load_seconds.items())
+    print(f"Retriever ready in {startup_seconds:.1f}s ({breakdown})", flush=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bind the port right away and load in the background, so orchestrators can tell
+    # "starting" (/health ok, /ready 503) from "dead" while the index and model load.
+    load_task = asyncio.create_task(load_retriever())
+    yield
+    load_task.cancel()
+    if scheduler is not None:
+        await scheduler.stop()
+    if isinstance(retriever, WorkerPool):
+        retriever.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def not_ready_response() -> JSONResponse:
+    status = "failed" if startup_error else "loading"
+    return JSONResponse(status_code=503, content={"status": status, "error": startup_error})
 
 
-app = FastAPI()
+@app.get("/health")
+def health_endpoint():
+    """Liveness: the process is up (the retriever may still be loading)."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready_endpoint():
+    """Readiness: 200 once the index, corpus and encoder are loaded, 503 before that or if loading failed."""
+    if scheduler is None:
+        return not_ready_response()
+    return {
+        "status": "ready",
+        "startup_seconds": startup_seconds,
+        "load_seconds": retriever.load_seconds,
+    }
 
 
 @app.post("/retrieve")
-def retrieve_endpoint(request: QueryRequest):
+async def retrieve_endpoint(request: QueryRequest):
     """
     Endpoint that accepts queries and performs retrieval.
 
@@ -334,7 +972,8 @@ def retrieve_endpoint(request: QueryRequest):
     {
       "queries": ["What is Python?", "Tell me about neural networks."],
       "topk": 3,
-      "return_scores": true
+      "return_scores": true,
+      "nprobe": 32  # optional, IVF indexes only (`ef_search` for HNSW)
     }
 
     Output format (when return_scores=True，similarity scores are returned):
@@ -349,31 +988,81 @@ def retrieve_endpoint(request: QueryRequest):
             # ... results for other queries
         ]
     }
+
+    Compact output (`"response_format": "compact"`), one row per query:
+    {
+        "ids": [[12, 873, 5], ...],
+        "scores": [[0.91, 0.88, 0.85], ...],
+        "contents": [["...", "...", "..."], ...]  # only with "include_contents": true
+    }
     """
+    if scheduler is None:
+        return not_ready_response()
     if not request.topk:
         request.topk = config.retrieval_topk  # fallback to default
 
-    # Perform batch retrieval
-    tmp = retriever.batch_search(query_list=request.queries, num=request.topk, return_score=request.return_scores)
+    search_params = {
+        key: value for key, value in (("nprobe", request.nprobe), ("ef_search", request.ef_search)) if value is not None
+    }
+    job = SearchJob(
+        queries=request.queries,
+        topk=request.topk,
+        search_params=search_params or None,
+        response_format=request.response_format,
+        return_scores=request.return_scores,
+        include_contents=request.include_contents,
+    )
+    if not request.queries:
+        # Same shape as a real answer in the requested format, just with no rows.
+        return Response(content=render_body(job, [], [], []), media_type="application/json")
+
+    # Perform batch retrieval, merged with any concurrent requests
+    body = await scheduler.submit(job)
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/docs")
+async def docs_endpoint(request: DocsRequest):
+    """
+    Documents by id, for clients resolving compact /retrieve responses.
 
-    scores = []
+    Input: {"ids": [12, 873]}   Output: {"documents": [{...}, {...}]}
+    """
+    if scheduler is None:
+        return not_ready_response()
     try:
-        results, scores = tmp
-    except ValueError:
-        results = tmp
+        docs = await asyncio.to_thread(retriever.fetch_docs, request.ids)
+    except UnknownDocumentError as exc:
+        return JSONResponse(status_code=400, content={"error": f"Unknown document id: {exc}"})
+    except WorkerDiedError as exc:
+        return JSONResponse(status_code=503, content={"error": str(exc)})
+    return FastJSONResponse({"documents": docs})
+
+
+@app.get("/stats")
+def stats_endpoint():
+    """
+    Runtime counters: merged batch sizes, time per stage (encode / search / doc_fetch),
+    query-embedding cache hits/misses and encoder throughput per length bucket.
+    With --num_workers > 1 the counters are summed over workers, so stage seconds are
+    busy time across all processes rather than wall time.
+    """
+    if scheduler is None:
+        return not_ready_response()
+    return {
+        "batch_sizes": {str(size): count for size, count in sorted(scheduler.batch_sizes.items())},
+        **retriever.stats(),
+    }
 
-    # Format response
-    resp = []
-    for i, single_result in enumerate(results):
-        if scores:
-            # If scores are returned, combine them with results
-            combined = []
-            for doc, score in zip(single_result, scores[i], strict=True):
-                combined.append({"document": doc, "score": score})
-            resp.append(combined)
-        else:
-            resp.append(single_result)
-    return {"result": resp}
+
+@app.post("/stats/reset")
+def reset_stats_endpoint():
+    """Zero all counters (cached embeddings are kept), e.g. between benchmark runs."""
+    if scheduler is None:
+        return not_ready_response()
+    scheduler.batch_sizes.clear()
+    retriever.reset_stats()
+    return {"ok": True}
 
 
 if __name__ == "__main__":
@@ -396,6 +1085,55 @@ if __name__ == "__main__":
         "--retriever_model", type=str, default="intfloat/e5-base-v2", help="Path of the retriever model."
     )
     parser.add_argument("--faiss_gpu", action="store_true", help="Use GPU for computation")
+    parser.add_argument(
+        "--faiss_mmap", action="store_true", help="Memory-map the index (IVF inverted lists) instead of loading it."
+    )
+    parser.add_argument("--nprobe", type=int, default=None, help="Default nprobe for IVF indexes.")
+    parser.add_argument("--ef_search", type=int, default=None, help="Default efSearch for HNSW indexes.")
+    parser.add_argument(
+        "--device", type=str, default=None, choices=["cuda", "cpu"], help="Encoder device (default: cuda if available)."
+    )
+    parser.add_argument(
+        "--cpu_dtype",
+        type=str,
+        default="fp32",
+        choices=["fp32", "bf16", "int8"],
+        help="Encoder precision on CPU; int8 applies torch dynamic quantization to Linear layers.",
+    )
+    parser.add_argument(
+        "--encode_batch_size", type=int, default=128, help="Max queries per length bucket in one encoder pass."
+    )
+    parser.add_argument(
+        "--num_threads",
+        type=int,
+        default=None,
+        help="torch intra-op threads for CPU encoding (per worker with --num_workers; default cores / workers).",
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=1,
+        help="Retrieval processes sharing one memory-mapped index and corpus (CPU serving only).",
+    )
+    parser.add_argument("--bm25_threads", type=int, default=8, help="Lucene search / doc fetch threads for BM25.")
+    parser.add_argument(
+        "--bm25_doc_cache_size", type=int, default=100_000, help="Parsed BM25 documents kept in the LRU cache."
+    )
+    parser.add_argument(
+        "--max_batch_size", type=int, default=512, help="Maximum number of queries merged into one search."
+    )
+    parser.add_argument(
+        "--batch_wait_ms",
+        type=float,
+        default=5.0,
+        help="How long to wait for more requests before dispatching a partial batch.",
+    )
+    parser.add_argument(
+        "--embedding_cache_mb",
+        type=float,
+        default=256.0,
+        help="Memory budget for the query-embedding LRU cache (0 disables it).",
+    )
 
     args = parser.parse_args()
 
@@ -407,15 +1145,29 @@ if __name__ == "__main__":
         corpus_path=args.corpus_path,
         retrieval_topk=args.topk,
         faiss_gpu=args.faiss_gpu,
+        faiss_mmap=args.faiss_mmap,
+        faiss_nprobe=args.nprobe,
+        faiss_ef_search=args.ef_search,
+        bm25_threads=args.bm25_threads,
+        bm25_doc_cache_size=args.bm25_doc_cache_size,
         retrieval_model_path=args.retriever_model,
         retrieval_pooling_method="mean",
         retrieval_query_max_length=256,
         retrieval_use_fp16=True,
-        retrieval_batch_size=512,
+        retrieval_batch_size=args.max_batch_size,
+        retrieval_batch_wait_ms=args.batch_wait_ms,
+        retrieval_embedding_cache_mb=args.embedding_cache_mb,
+        retrieval_device=args.device,
+        retrieval_cpu_dtype=args.cpu_dtype,
+        retrieval_encode_batch_size=args.encode_batch_size,
+        num_workers=args.num_workers,
+        worker_threads=args.num_threads,
     )
+    if args.num_workers > 1 and args.faiss_gpu:
+        parser.error("--num_workers > 1 serves a shared CPU index; it cannot be combined with --faiss_gpu.")
+    if args.num_threads:
+        torch.set_num_threads(args.num_threads)
 
-    # 2) Instantiate a global retriever so it is loaded once and reused.
-    retriever = get_retriever(config)
-
-    # 3) Launch the server. By default, it listens on http://127.0.0.1:8000
+    # 2) Launch the server. By default, it listens on http://127.0.0.1:8000.
+    #    The global retriever is loaded in the background; poll GET /ready before sending traffic.
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,270 @@
+# Multi-process retrieval workers for retrieval_server.py (--num_workers N).
+#
+# Each worker process builds its own retriever from the server Config. The FAISS index is opened
+# memory-mapped and the corpus is a CorpusStore memmap, so their pages sit once in the OS page
+# cache and are shared by every worker; only the encoder weights and the query-embedding cache
+# are per process. The server's BatchScheduler keeps up to N merged batches in flight and each
+# one runs on whichever worker is idle. A worker runs the whole batch (search, document decoding and
+# JSON encoding of every response body), so only finished bytes travel back to the server process.
+# A worker that dies (OOM kill, crash) fails its in-flight batch and is restarted in the background.
+
+import copy
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import traceback
+
+from corpus_store import UnknownDocumentError
+
+
+def _worker_main(conn, config, num_threads: int | None):
+    try:
+        if num_threads:
+            import faiss
+            import torch
+
+            torch.set_num_threads(num_threads)
+            faiss.omp_set_num_threads(num_threads)
+        from retrieval_server import get_retriever
+
+        retriever = get_retriever(config)
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+        return
+    conn.send(("ready", retriever.load_seconds))
+
+    while True:
+        try:
+            method, args, kwargs = conn.recv()
+        except EOFError:
+            return  # the server went away
+        if method is None:
+            return
+        try:
+            conn.send(("ok", getattr(retriever, method)(*args, **kwargs)))
+        except UnknownDocumentError as exc:
+            conn.send(("unknown_document", str(exc)))
+        except Exception as exc:
+            conn.send(("error", f"{type(exc).__name__}: {exc}"))
+
+
+class WorkerDiedError(RuntimeError):
+    """The worker process exited while serving a call."""
+
+
+def merge_stats(worker_stats: list[dict]) -> dict:
+    """Sum per-worker counters into one /stats payload; rates are recomputed from the sums."""
+    stages: dict[str, dict] = {}
+    buckets: dict[str, dict] = {}
+    caches = []
+    for stats in worker_stats:
+        for stage, entry in stats.get("stages", {}).items():
+            total = stages.setdefault(stage, {"calls": 0, "seconds": 0.0})
+            total["calls"] += entry["calls"]
+            total["seconds"] += entry["seconds"]
+        for bucket, entry in (stats.get("encoder_buckets") or {}).items():
+            total = buckets.setdefault(bucket, {"batches": 0, "sequences": 0, "tokens": 0, "seconds": 0.0})
+            for key in total:
+                total[key] += entry[key]
+        if stats.get("embedding_cache"):
+            caches.append(stats["embedding_cache"])
+
+    merged = {"num_workers": len(worker_stats), "stages": stages}
+    if caches:
+        cache = {key: sum(item[key] for item in caches) for key in ("entries", "bytes", "max_bytes", "hits", "misses")}
+        lookups = cache["hits"] + cache["misses"]
+        cache["hit_rate"] = cache["hits"] / lookups if lookups else 0.0
+        merged["embedding_cache"] = cache
+    if buckets:
+        for entry in buckets.values():
+            entry["sequences_per_s"] = entry["sequences"] / entry["seconds"] if entry["seconds"] else 0.0
+            entry["tokens_per_s"] = entry["tokens"] / entry["seconds"] if entry["seconds"] else 0.0
+        merged["encoder_buckets"] = dict(sorted(buckets.items(), key=lambda item: int(item[0].lstrip("<="))))
+    return merged
+
+
+class WorkerPool:
+    """
+    Retriever-compatible front for `num_workers` retrieval processes.
+
+    Calls are blocking and thread-safe: each one borrows an idle worker, so the scheduler's
+    executor threads (one per worker) never queue behind each other on the same process.
+    """
+
+    RESTART_BACKOFF_SECONDS = (1.0, 5.0, 30.0)
+    # How often a broadcast waiting for a busy worker re-counts the live ones.
+    BROADCAST_POLL_SECONDS = 0.5
+
+    def __init__(self, config, num_workers: int, threads_per_worker: int | None = None):
+        # Workers must not copy the index into private memory, and GPU clones cannot be shared.
+        if config.faiss_gpu:
+            raise ValueError("Multi-process serving shares a CPU index; drop --faiss_gpu or use --num_workers 1.")
+        config = copy.copy(config)
+        config.faiss_mmap = True
+        config.num_workers = 1
+        if threads_per_worker is None:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // num_workers)
+
+        # fork is unsafe once torch / OpenMP thread pools exist in the parent
+        self._ctx = mp.get_context("spawn")
+        self._config = config
+        self._threads_per_worker = threads_per_worker
+        self.num_workers = num_workers
+        self.restarts = 0
+        self._closed = False
+        self._conns = []
+        self._processes = []
+        for rank in range(num_workers):
+            conn, process = self._start(rank)
+            self._conns.append(conn)
+            self._processes.append(process)
+
+        # Workers load concurrently; the slowest one decides when the pool is ready.
+        self.load_seconds: dict[str, float] = {}
+        for rank in range(num_workers):
+            try:
+                payload = self._wait_ready(rank)
+            except RuntimeError:
+                self.close()
+                raise
+            for name, seconds in payload.items():
+                self.load_seconds[name] = max(seconds, self.load_seconds.get(name, 0.0))
+
+        # Idle worker ranks; a restarting worker rejoins once it is ready.
+        self._idle: queue.Queue = queue.Queue()
+        for rank in range(num_workers):
+            self._idle.put(rank)
+        self._restarting: set[int] = set()
+        self._state_lock = threading.Lock()
+        self._broadcast_lock = threading.Lock()
+
+    def _start(self, rank: int):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self._config, self._threads_per_worker),
+            name=f"retrieval-worker-{rank}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return parent_conn, process
+
+    def _wait_ready(self, rank: int) -> dict[str, float]:
+        try:
+            status, payload = self._conns[rank].recv()
+        except EOFError:
+            status, payload = "error", "worker exited during startup"
+        if status != "ready":
+            raise RuntimeError(f"Retrieval worker {rank} failed to start:\n{payload}")
+        return payload
+
+    def _restart(self, rank: int):
+        """Replace a dead worker; runs on its own thread while the other workers keep serving."""
+        attempt = 0
+        while not self._closed:
+            self._conns[rank].close()
+            self._processes[rank].join(timeout=5)
+            if self._processes[rank].is_alive():
+                self._processes[rank].terminate()
+            self._conns[rank], self._processes[rank] = self._start(rank)
+            try:
+                self._wait_ready(rank)
+            except RuntimeError:
+                traceback.print_exc()
+                time.sleep(self.RESTART_BACKOFF_SECONDS[min(attempt, len(self.RESTART_BACKOFF_SECONDS) - 1)])
+                attempt += 1
+                continue
+            with self._state_lock:
+                self._restarting.discard(rank)
+                self.restarts += 1
+            self._idle.put(rank)
+            return
+
+    def _call(self, rank: int, method: str, *args, release: bool = True, **kwargs):
+        """Run `method` on worker `rank`, then hand the worker back (or to a restart if it died)."""
+        conn = self._conns[rank]
+        try:
+            conn.send((method, args, kwargs))
+            status, payload = conn.recv()
+        except (EOFError, OSError):
+            process = self._processes[rank]
+            process.join(timeout=1)
+            with self._state_lock:
+                self._restarting.add(rank)
+            threading.Thread(target=self._restart, args=(rank,), name=f"restart-{process.name}", daemon=True).start()
+            raise WorkerDiedError(
+                f"Retrieval worker {rank} died (exit code {process.exitcode}) during `{method}`; restarting it."
+            ) from None
+        if release:
+            self._idle.put(rank)
+        if status == "unknown_document":
+            raise UnknownDocumentError(payload)
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+    def _submit(self, method: str, *args, **kwargs):
+        return self._call(self._idle.get(), method, *args, **kwargs)
+
+    def run_jobs(self, jobs: list) -> list[bytes]:
+        return self._submit("run_jobs", jobs)
+
+    def batch_search(
+        self, query_list: list[str], num: int = None, return_score: bool = False, search_params: dict | None = None
+    ):
+        return self._submit(
+            "batch_search", query_list, num=num, return_score=return_score, search_params=search_params
+        )
+
+    def batch_search_ids(self, query_list: list[str], num: int = None, search_params: dict | None = None):
+        return self._submit("batch_search_ids", query_list, num=num, search_params=search_params)
+
+    def fetch_docs(self, doc_ids: list) -> list[dict]:
+        return self._submit("fetch_docs", doc_ids)
+
+    def _broadcast(self, method: str) -> list:
+        # Borrow every live worker (waiting for in-flight batches) so each answers exactly once.
+        # The lock keeps two broadcasts from each holding half the pool.
+        with self._broadcast_lock:
+            held: list[int] = []
+            results = []
+            try:
+                while True:
+                    # Re-counted on every wait: a worker may die or come back from a restart meanwhile.
+                    with self._state_lock:
+                        waiting = self.num_workers - len(self._restarting) - len(held)
+                    if waiting <= 0:
+                        return results
+                    try:
+                        rank = self._idle.get(timeout=self.BROADCAST_POLL_SECONDS)
+                    except queue.Empty:
+                        continue
+                    held.append(rank)
+                    try:
+                        results.append(self._call(rank, method, release=False))
+                    except WorkerDiedError:
+                        held.remove(rank)
+            finally:
+                for rank in held:
+                    self._idle.put(rank)
+
+    def stats(self) -> dict:
+        return {**merge_stats(self._broadcast("stats")), "worker_restarts": self.restarts}
+
+    def reset_stats(self):
+        self._broadcast("reset_stats")
+
+    def close(self):
+        self._closed = True
+        for conn in self._conns:
+            try:
+                conn.send((None, (), {}))
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,120 @@
+# Parity and speed check of the tiered math checker against the plain sympy checker.
+# python scripts/bench_math_grading.py [--input pairs.jsonl] [--repeat 3]
+#
+# Without --input, a MATH-style answer set is generated: integers, fractions, decimals, radicals,
+# pi, polynomials, tuples and intervals, each paired with equivalent and wrong model answers.
+# An --input file holds one {"answer": ..., "label": ...} object per line (raw LaTeX, no \boxed).
+
+import argparse
+import json
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from openrlhf_agent.agentkit.rewards.result_rewards.hub.math_utils import (
+    GRADE_TIERS,
+    grade_normalized_sympy,
+    grade_normalized_tiered,
+    normalize_answer,
+)
+
+
+def synthetic_pairs(count: int, seed: int) -> List[Tuple[str, str]]:
+    """(model answer, label) pairs in the shapes MATH answers take."""
+
+    rng = random.Random(seed)
+    pairs: List[Tuple[str, str]] = []
+    while len(pairs) < count:
+        a, b = rng.randint(1, 40), rng.randint(2, 40)
+        c = rng.randint(2, 9)
+        kind = rng.choice(["int", "frac", "decimal", "radical", "pi", "poly", "tuple", "interval", "text"])
+        if kind == "int":
+            label = str(a * b)
+            answers = [label, f"{a * b}.0", f"{a * b:,}", str(a * b + 1), f"{a}\\cdot {b}"]
+        elif kind == "frac":
+            label = f"\\frac{{{a}}}{{{b}}}"
+            answers = [f"\\dfrac{{{a}}}{{{b}}}", f"{a}/{b}", f"\\frac{{{a * c}}}{{{b * c}}}", f"\\frac{{{b}}}{{{a}}}"]
+            if b in (2, 4, 5, 8, 10, 20, 25, 40):
+                answers.append(str(a / b))
+        elif kind == "decimal":
+            label = f"{a}.{b}"
+            answers = [f"{a}.{b}0", f"\\frac{{{a * 100 + b if b >= 10 else a * 10 + b}}}{{{100 if b >= 10 else 10}}}",
+                       f"{a}.{b + 1}"]
+        elif kind == "radical":
+            label = f"{a}\\sqrt{{{c}}}"
+            answers = [f"\\sqrt{{{a * a * c}}}", f"{a}\\sqrt{c}", f"\\sqrt{{{c}}}\\cdot {a}", f"{a + 1}\\sqrt{{{c}}}",
+                       f"\\frac{{{a * c}}}{{\\sqrt{{{c}}}}}"]
+        elif kind == "pi":
+            label = f"\\frac{{{a}\\pi}}{{{b}}}"
+            answers = [f"\\frac{{{a}}}{{{b}}}\\pi", f"{a}\\pi/{b}", f"\\frac{{{a + 1}\\pi}}{{{b}}}", "3.14"]
+        elif kind == "poly":
+            label = f"x^2+{a + c}x+{a * c}"
+            answers = [f"(x+{a})(x+{c})", f"x^2+{a * c}+{a + c}x", f"(x+{a})^2", f"{a * c}+x({a + c}+x)"]
+        elif kind == "tuple":
+            label = f"({a}, {b})"
+            answers = [f"({a},{b})", f"\\left({a}, {b}\\right)", f"({b}, {a})", f"({a}, \\frac{{{2 * b}}}{{2}})"]
+        elif kind == "interval":
+            label = f"[{a}, {a + b})"
+            answers = [f"[{a},{a + b})", f"({a}, {a + b})", f"[{a}, {a + b + 1})"]
+        else:
+            label = f"\\text{{{a} cm}}"
+            answers = [f"{a}", f"{a}\\text{{ cm}}", f"{a + 1}"]
+        pairs.extend((answer, label) for answer in answers)
+    return pairs[:count]
+
+
+def load_pairs(path: str) -> List[Tuple[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [(str(record["answer"]), str(record["label"])) for record in records]
+
+
+def time_checker(checker, items: List[Tuple[str, str]], repeat: int) -> Tuple[List[bool], float]:
+    verdicts: List[bool] = []
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        verdicts = [checker(given, label) for given, label in items]
+        best = min(best, time.perf_counter() - started)
+    return verdicts, best
+
+
+def main(args: argparse.Namespace) -> None:
+    pairs = load_pairs(args.input) if args.input else synthetic_pairs(args.num_pairs, args.seed)
+    # Normalization is memoized and shared by both checkers, so it is done up front.
+    items = [(normalize_answer(answer), normalize_answer(label)) for answer, label in pairs]
+
+    tiers: Dict[str, int] = Counter()
+
+    def tiered(given: str, label: str) -> bool:
+        verdict, tier = grade_normalized_tiered(given, label)
+        tiers[tier] += 1
+        return bool(verdict)
+
+    baseline, baseline_seconds = time_checker(grade_normalized_sympy, items, args.repeat)
+    fast, fast_seconds = time_checker(tiered, items, args.repeat)
+
+    mismatches = [(pair, base) for pair, base, new in zip(pairs, baseline, fast) if base != new]
+    print(f"pairs: {len(items)} ({sum(baseline)} equivalent under sympy)")
+    print(f"parity: {len(items) - len(mismatches)}/{len(items)} identical verdicts")
+    for (answer, label), base in mismatches[: args.show_mismatches]:
+        print(f"  sympy={base} tiered={not base}: answer={answer!r} label={label!r}")
+    print(f"sympy checker:  {baseline_seconds:.3f}s ({1000 * baseline_seconds / len(items):.2f} ms/pair)")
+    print(f"tiered checker: {fast_seconds:.3f}s ({1000 * fast_seconds / len(items):.2f} ms/pair)")
+    print(f"speedup: {baseline_seconds / fast_seconds:.1f}x")
+    print("deciding tier:")
+    for tier in GRADE_TIERS:
+        count = tiers[tier] // args.repeat
+        if count:
+            print(f"  {tier:<10} {count:>6} {100 * count / len(items):>5.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the tiered math checker with plain sympy grading.")
+    parser.add_argument("--input", type=str, default=None, help="JSONL of {'answer': ..., 'label': ...} pairs.")
+    parser.add_argument("--num_pairs", type=int, default=2000, help="Size of the synthetic set without --input.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per checker; the best is reported.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--show_mismatches", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,22 @@
+# Build the memory-mapped BM25 index read by `BM25SearchTool`.
+# python scripts/build_bm25_index.py --corpus_path wiki-18.jsonl --index_path bm25_inproc [--k1 0.9] [--b 0.4]
+#
+# The corpus is Search-R1 style JSONL with a `contents` field (or `title` + `text`). Needs numpy
+# and scipy (`pip install -e .[retrieval]`).
+
+import argparse
+import json
+
+from openrlhf_agent.agentkit.tools.hub.bm25_search import BM25Index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an in-process BM25 index for `BM25SearchTool`.")
+    parser.add_argument("--corpus_path", type=str, required=True, help="JSONL corpus with a `contents` field.")
+    parser.add_argument("--index_path", type=str, required=True, help="Output directory for the index.")
+    parser.add_argument("--k1", type=float, default=0.9)
+    parser.add_argument("--b", type=float, default=0.4)
+    args = parser.parse_args()
+
+    index = BM25Index.build(args.corpus_path, args.index_path, k1=args.k1, b=args.b)
+    print(json.dumps(index.meta, indent=2))
@@ -0,0 +1,36 @@
+# Precompute normalized labels for `MathMatchingReward(label_index=...)`.
+# python scripts/build_label_index.py --dataset train.jsonl --output train.labels.json.gz [--label_key label]
+#
+# The dataset is JSONL (or a JSON list) of training samples. Each distinct string label, or list
+# of alternative labels, is unboxed and normalized once; a .gz output suffix compresses the index.
+
+import argparse
+import gzip
+import json
+import os
+from typing import Any, Iterable, Mapping
+
+from openrlhf_agent.agentkit.rewards.result_rewards.hub.label_index import LabelIndex
+
+
+def iter_records(dataset_path: str) -> Iterable[Mapping[str, Any]]:
+    opener = gzip.open if dataset_path.endswith(".gz") else open
+    with opener(dataset_path, "rt", encoding="utf-8") as handle:
+        if dataset_path.endswith((".json", ".json.gz")):
+            yield from json.load(handle)
+            return
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute normalized labels for `MathMatchingReward`.")
+    parser.add_argument("--dataset", type=str, required=True, help="JSONL (or JSON list) of training samples.")
+    parser.add_argument("--output", type=str, required=True, help="Index file; a .gz suffix compresses it.")
+    parser.add_argument("--label_key", type=str, default="label")
+    args = parser.parse_args()
+
+    index = LabelIndex.build(iter_records(args.dataset), label_key=args.label_key)
+    index.save(args.output)
+    print(json.dumps({**index.stats(), "bytes": os.path.getsize(args.output)}, indent=2))
@@ -0,0 +1,255 @@
+# Re-score recorded trajectories with the current reward strategies, without an LLM engine.
+# python scripts/rescore_trajectories.py --input rollouts.jsonl --output_dir rescored/ \
+#     [--session_factory my_rewards.py:make_session] [--concurrency 64] [--chunk_size 1024]
+#
+# Each input line is one episode: {"id": ..., "prompt": <messages or rendered text>, "label": ...,
+# "responses": [<raw assistant text of step 1>, <step 2>, ...]} (keys are configurable). Episodes are
+# replayed through `AgentSession` so parsing, tool execution and `done` match training; the tools
+# of the factory's environment are re-run, the model is not. All steps of a chunk are then scored
+# with one `RewardPipeline.score_batch` call, so strategies keep their batching (vectorized tool
+# policies, the sympy pool, batched judge calls) and their caches. Identical steps are scored once.
+#
+# `--session_factory` names a zero-argument callable, as `module:function` or `path.py:function`,
+# that returns a fresh `AgentSession` with a reward pipeline; the default mirrors examples/qwen3.
+# Writes steps.csv (one row per step) and episodes.csv (one row per episode) to --output_dir.
+
+import argparse
+import asyncio
+import csv
+import importlib
+import importlib.util
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from openrlhf_agent.agentkit.environments import FunctionCallEnvironment
+from openrlhf_agent.agentkit.protocols import Qwen3ThinkingProtocol
+from openrlhf_agent.agentkit.rewards import RewardPipeline, ToolCallReward
+from openrlhf_agent.agentkit.rewards.result_rewards import MatchingReward
+from openrlhf_agent.agentkit.session import AgentSession
+from openrlhf_agent.utils.cache import make_cache_key
+from openrlhf_agent.utils.types import Action, RewardSample
+
+STEP_COLUMNS = ["episode_id", "step", "done", "num_tool_calls", "parse_error", "reward"]
+EPISODE_COLUMNS = [
+    "episode_id", "steps", "finished", "process_reward", "result_reward", "total_reward", "unused_responses",
+]
+
+
+def default_session() -> AgentSession:
+    """The reward setup of examples/qwen3/agent_func.py."""
+
+    pipeline = RewardPipeline(
+        process_reward=ToolCallReward(
+            parse_error_penalty=-0.2,
+            penalty_for_refused=-0.1,
+            tool_policies={"commentary": dict(max_calls=1, reward_per_call=0.1, overuse_penalty=-0.1)},
+        ),
+        result_reward=MatchingReward(correct_score=1.0, miss_score=0.0),
+    )
+    return AgentSession(
+        environment=FunctionCallEnvironment(), protocol=Qwen3ThinkingProtocol(), reward_pipeline=pipeline
+    )
+
+
+def load_factory(spec: Optional[str]) -> Callable[[], AgentSession]:
+    if not spec:
+        return default_session
+    target, _, name = spec.rpartition(":")
+    if not target or not name:
+        raise ValueError(f"--session_factory must look like module:function or path.py:function, got {spec!r}")
+    if target.endswith(".py"):
+        module_spec = importlib.util.spec_from_file_location("rescore_session_factory", target)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(target)
+    return getattr(module, name)
+
+
+@dataclass
+class ReplayedStep:
+    episode_id: str
+    index: int
+    action: Action
+    raw_text: str
+    label: Any
+    done: bool
+    sample: RewardSample
+    reward: float = 0.0
+
+
+@dataclass
+class ReplayedEpisode:
+    episode_id: str
+    steps: List[ReplayedStep] = field(default_factory=list)
+    finished: bool = False
+    unused_responses: int = 0
+
+
+async def replay_episode(session: AgentSession, record: Dict[str, Any], args: argparse.Namespace, line: int):
+    """Step a fresh session through the recorded responses; rewards are computed later in bulk."""
+
+    episode = ReplayedEpisode(episode_id=str(record.get(args.id_key, line)))
+    label = record.get(args.label_key)
+    responses = record.get(args.responses_key) or []
+
+    await session.initialize(record.get(args.prompt_key))
+    for index, text in enumerate(responses):
+        action = session.protocol.parse_assistant_text(text)
+        # No label: the session skips its own reward call.
+        observation, _ = await session.step(action, raw_text=text)
+        episode.steps.append(
+            ReplayedStep(episode.episode_id, index, action, text, label, observation.done, session.reward_sample())
+        )
+        if observation.done:
+            episode.finished = True
+            episode.unused_responses = len(responses) - index - 1
+            break
+    return episode
+
+
+def dump_messages(messages) -> List[Any]:
+    return [m.model_dump(exclude_none=True) if hasattr(m, "model_dump") else m for m in messages or []]
+
+
+def step_key(step: ReplayedStep) -> str:
+    """Everything the pipeline sees for this step; only result strategies read the sample."""
+
+    if not step.done:
+        return make_cache_key("process", step.raw_text, step.label)
+    sample = step.sample
+    return make_cache_key(
+        "result", step.raw_text, step.label, dump_messages(sample.question), dump_messages(sample.process_messages)
+    )
+
+
+async def rescore_chunk(
+    records, factory, pipeline: RewardPipeline, args, first_line: int, stats: Dict[str, float]
+) -> List[ReplayedEpisode]:
+    started = time.perf_counter()
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def replay(offset: int, record: Dict[str, Any]) -> ReplayedEpisode:
+        async with limit:
+            return await replay_episode(factory(), record, args, first_line + offset)
+
+    episodes = await asyncio.gather(*(replay(offset, record) for offset, record in enumerate(records)))
+    stats["replay_seconds"] += time.perf_counter() - started
+
+    steps = [step for episode in episodes for step in episode.steps]
+    unique: Dict[str, ReplayedStep] = {}
+    keys = [step_key(step) for step in steps]
+    for key, step in zip(keys, steps):
+        if step.label is not None:  # training skips rewards for unlabeled samples too
+            unique.setdefault(key, step)
+    stats["steps"] += len(steps)
+    stats["scored_steps"] += len(unique)
+
+    started = time.perf_counter()
+    todo = list(unique.values())
+    rewards = await pipeline.score_batch(
+        actions=[step.action for step in todo],
+        labels=[step.label for step in todo],
+        dones=[step.done for step in todo],
+        samples=[step.sample if step.done else None for step in todo],
+    )
+    stats["score_seconds"] += time.perf_counter() - started
+
+    by_key = dict(zip(unique, rewards))
+    for key, step in zip(keys, steps):
+        step.reward = by_key.get(key, 0.0)
+    return episodes
+
+
+def write_rows(step_writer, episode_writer, episodes: List[ReplayedEpisode]) -> None:
+    for episode in episodes:
+        process = result = 0.0
+        for step in episode.steps:
+            if step.done:
+                result += step.reward
+            else:
+                process += step.reward
+            step_writer.writerow({
+                "episode_id": step.episode_id,
+                "step": step.index,
+                "done": int(step.done),
+                "num_tool_calls": len(step.action.tool_calls or []),
+                "parse_error": int(bool(step.action.refusal)),
+                "reward": step.reward,
+            })
+        episode_writer.writerow({
+            "episode_id": episode.episode_id,
+            "steps": len(episode.steps),
+            "finished": int(episode.finished),
+            "process_reward": process,
+            "result_reward": result,
+            "total_reward": process + result,
+            "unused_responses": episode.unused_responses,
+        })
+
+
+def read_chunks(path: str, chunk_size: int):
+    chunk: List[Dict[str, Any]] = []
+    first_line = 0
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            if not line.strip():
+                continue
+            if not chunk:
+                first_line = line_number
+            chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                yield first_line, chunk
+                chunk = []
+    if chunk:
+        yield first_line, chunk
+
+
+async def main(args: argparse.Namespace) -> None:
+    factory = load_factory(args.session_factory)
+    # One pipeline scores every chunk, so strategy caches carry over between chunks.
+    pipeline = factory().reward_pipeline
+    if pipeline is None:
+        raise ValueError("The session factory must attach a reward_pipeline.")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stats: Dict[str, float] = {"steps": 0, "scored_steps": 0, "replay_seconds": 0.0, "score_seconds": 0.0}
+    episodes_total = finished = 0
+    total_reward = 0.0
+
+    with open(os.path.join(args.output_dir, "steps.csv"), "w", newline="", encoding="utf-8") as steps_file, \
+            open(os.path.join(args.output_dir, "episodes.csv"), "w", newline="", encoding="utf-8") as episodes_file:
+        step_writer = csv.DictWriter(steps_file, fieldnames=STEP_COLUMNS)
+        episode_writer = csv.DictWriter(episodes_file, fieldnames=EPISODE_COLUMNS)
+        step_writer.writeheader()
+        episode_writer.writeheader()
+
+        for first_line, records in read_chunks(args.input, args.chunk_size):
+            episodes = await rescore_chunk(records, factory, pipeline, args, first_line, stats)
+            write_rows(step_writer, episode_writer, episodes)
+            episodes_total += len(episodes)
+            finished += sum(episode.finished for episode in episodes)
+            total_reward += sum(step.reward for episode in episodes for step in episode.steps)
+            print(f"{episodes_total} episodes, {int(stats['steps'])} steps", flush=True)
+
+    print(f"episodes: {episodes_total} ({finished} finished), mean reward {total_reward / max(1, episodes_total):.4f}")
+    print(f"steps: {int(stats['steps'])} ({int(stats['scored_steps'])} scored after deduplication)")
+    print(f"replay: {stats['replay_seconds']:.2f}s, scoring: {stats['score_seconds']:.2f}s")
+    print(f"wrote {args.output_dir}/steps.csv and {args.output_dir}/episodes.csv")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded trajectories and recompute their rewards.")
+    parser.add_argument("--input", type=str, required=True, help="JSONL with one recorded episode per line.")
+    parser.add_argument("--output_dir", type=str, required=True)
+    parser.add_argument("--session_factory", type=str, default=None, help="module:function or path.py:function.")
+    parser.add_argument("--concurrency", type=int, default=64, help="Episodes replayed at once.")
+    parser.add_argument("--chunk_size", type=int, default=1024, help="Episodes per score_batch call.")
+    parser.add_argument("--id_key", type=str, default="id")
+    parser.add_argument("--prompt_key", type=str, default="prompt")
+    parser.add_argument("--label_key", type=str, default="label")
+    parser.add_argument("--responses_key", type=str, default="responses")
+    asyncio.run(main(parser.parse_args()))
@@ -30,6 +30,10 @@ setup(
             "ruff>=0.5",
             "mypy>=1.10",
         ],
+        "retrieval": [
+            "numpy>=1.24",
+            "scipy>=1.10",
+        ],
     },
     classifiers=[
         "License :: OSI Approved :: Apache Software License",
@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 
-from typing import Any, Optional
+import asyncio
+from typing import Any, List, Optional, Sequence
 
 from openrlhf_agent.utils.types import Action, RewardSample
 
@@ -45,3 +46,53 @@ class RewardPipeline:
             reward += await self._result_reward.score(action=action, label=label, sample=sample)
 
         return reward
+
+    async def score_batch(
+        self,
+        *,
+        actions: Sequence[Action],
+        labels: Sequence[Optional[Any]],
+        dones: Sequence[bool],
+        samples: Optional[Sequence[Optional[RewardSample]]] = None,
+    ) -> List[float]:
+        """Score a whole batch of actions, e.g. every step of a rollout batch, in one call.
+
+        Unfinished steps go to the process strategy and finished ones to the result strategy,
+        each as a single `score_batch` call; the two run concurrently. Rewards come back in
+        input order, identical to calling `score` per item.
+        """
+
+        if samples is None:
+            samples = [None] * len(actions)
+        if not len(actions) == len(labels) == len(dones) == len(samples):
+            raise ValueError("actions, labels, dones and samples must have the same length")
+
+        rewards = [0.0] * len(actions)
+        process_idx = [i for i, done in enumerate(dones) if not done] if self._process_reward else []
+        result_idx = [i for i, done in enumerate(dones) if done] if self._result_reward else []
+
+        async def run_process() -> None:
+            scores = await self._process_reward.score_batch(
+                actions=[actions[i] for i in process_idx],
+                labels=[labels[i] for i in process_idx],
+            )
+            for i, value in zip(process_idx, scores):
+                rewards[i] += value
+
+        async def run_result() -> None:
+            scores = await self._result_reward.score_batch(
+                actions=[actions[i] for i in result_idx],
+                labels=[labels[i] for i in result_idx],
+                samples=[samples[i] for i in result_idx],
+            )
+            for i, value in zip(result_idx, scores):
+                rewards[i] += value
+
+        jobs = []
+        if process_idx:
+            jobs.append(run_process())
+        if result_idx:
+            jobs.append(run_result())
+        await asyncio.gather(*jobs)
+
+        return rewards
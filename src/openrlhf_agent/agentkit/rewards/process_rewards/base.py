@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from typing import Any, List, Optional, Sequence
 
 from openrlhf_agent.utils.types import Action
 
@@ -19,3 +20,18 @@ class ProcessRewardStrategy(ABC):
         label: Optional[Any],
     ) -> float:
         """Return the reward associated with the latest tool usage."""
+
+    async def score_batch(
+        self,
+        *,
+        actions: Sequence[Action],
+        labels: Sequence[Optional[Any]],
+    ) -> List[float]:
+        """Score many intermediate steps at once; the default runs `score` concurrently."""
+
+        if len(actions) != len(labels):
+            raise ValueError("actions and labels must have the same length")
+
+        return list(
+            await asyncio.gather(*(self.score(action=action, label=label) for action, label in zip(actions, labels)))
+        )
@@ -4,11 +4,16 @@ from __future__ import annotations
 
 from collections import Counter
 from dataclasses import dataclass, field
-from typing import Any, Mapping, Optional
+from typing import Any, List, Mapping, Optional, Sequence
 
 from openrlhf_agent.agentkit.rewards.process_rewards.base import ProcessRewardStrategy
 from openrlhf_agent.utils.types import Action
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
 
 @dataclass
 class ToolPolicy:
@@ -35,7 +40,13 @@ class ToolPolicy:
 
 @dataclass
 class ToolCallReward(ProcessRewardStrategy):
-    """Per-tool scoring with simple caps and penalties."""
+    """Per-tool scoring with simple caps and penalties.
+
+    `score` applies `max_calls` to a single step. `score_batch` gives the same rewards for many
+    steps at once, and `score_trajectories` scores whole episodes with `max_calls` as an episode
+    budget; both build one (steps x tools) call-count matrix and apply the policies with NumPy,
+    or loop over the steps in Python when NumPy is not installed.
+    """
 
     min_reward: Optional[float] = None
     max_reward: Optional[float] = None
@@ -105,3 +116,134 @@ class ToolCallReward(ProcessRewardStrategy):
         counts, refused = self._collect_call_stats(action)
         reward = self._score_counts(counts, refused)
         return self._clamp(reward)
+
+    def _policy_arrays(self):
+        names = list(self.tool_policies)
+        policies = [self.tool_policies[name] for name in names]
+        reward_per_call = np.array([policy.reward_per_call for policy in policies], dtype=np.float64)
+        overuse_penalty = np.array([policy.overuse_penalty for policy in policies], dtype=np.float64)
+        allowed = np.array(
+            [max(0, policy.max_calls) if policy.max_calls is not None else np.inf for policy in policies],
+            dtype=np.float64,
+        )
+        return {name: column for column, name in enumerate(names)}, reward_per_call, overuse_penalty, allowed
+
+    def _count_matrix(self, actions: Sequence[Action], columns: Mapping[str, int]):
+        """Return (calls per step and tool, refused calls per step, parse-error mask)."""
+
+        rows: List[int] = []
+        cols: List[int] = []
+        refused = np.zeros(len(actions), dtype=np.float64)
+        parse_errors = np.zeros(len(actions), dtype=bool)
+        for row, action in enumerate(actions):
+            if action.refusal:
+                parse_errors[row] = True
+                continue
+            for call in action.tool_calls or []:
+                name = (call.name or "").strip() if call is not None and not call.refusal else ""
+                if not name:
+                    refused[row] += 1
+                    continue
+                column = columns.get(name.lower())
+                if column is not None:  # ignore calls to tools without a policy
+                    rows.append(row)
+                    cols.append(column)
+
+        counts = np.zeros((len(actions), len(columns)), dtype=np.float64)
+        np.add.at(counts, (rows, cols), 1.0)
+        return counts, refused, parse_errors
+
+    @staticmethod
+    def _apply_policies(counts, used, reward_per_call, overuse_penalty, allowed):
+        """Per step and tool: `counts * reward_per_call` while `used <= allowed`, else the overuse penalty.
+
+        Only the calls beyond the cap are penalized, and a step that crosses the cap earns no
+        per-call reward, as `score` treats a single step.
+        """
+
+        over = np.minimum(counts, np.maximum(used - allowed, 0.0))
+        return np.where(used <= allowed, counts * reward_per_call, over * overuse_penalty)
+
+    def _finish(self, rewards, refused, parse_errors) -> List[float]:
+        rewards = rewards + refused * self.penalty_for_refused
+        rewards = np.where(parse_errors, self.parse_error_penalty, rewards)
+        if self.min_reward is not None or self.max_reward is not None:
+            rewards = np.clip(rewards, self.min_reward, self.max_reward)
+        return rewards.tolist()
+
+    async def score_batch(
+        self,
+        *,
+        actions: Sequence[Action],
+        labels: Sequence[Optional[Any]],
+    ) -> List[float]:
+        """Score many independent steps in one NumPy pass; same rewards as `score` per step."""
+
+        if len(actions) != len(labels):
+            raise ValueError("actions and labels must have the same length")
+        if not actions:
+            return []
+        if np is None:
+            return await super().score_batch(actions=actions, labels=labels)
+
+        columns, reward_per_call, overuse_penalty, allowed = self._policy_arrays()
+        counts, refused, parse_errors = self._count_matrix(actions, columns)
+        per_tool = self._apply_policies(counts, counts, reward_per_call, overuse_penalty, allowed)
+        return self._finish(per_tool.sum(axis=1), refused, parse_errors)
+
+    def score_trajectories(self, trajectories: Sequence[Sequence[Action]]) -> List[List[float]]:
+        """Per-step rewards for whole episodes, with `max_calls` as a budget per episode.
+
+        A step earns `reward_per_call` per call while the episode stays within the tool's budget;
+        once a step takes it over, each call beyond the budget costs `overuse_penalty`. Refused
+        calls and parse errors score as in `score`, so a one-step episode scores exactly as `score`.
+        """
+
+        steps = [action for trajectory in trajectories for action in trajectory]
+        if not steps:
+            return [[] for _ in trajectories]
+        if np is None:
+            return [self._score_trajectory(trajectory) for trajectory in trajectories]
+
+        columns, reward_per_call, overuse_penalty, allowed = self._policy_arrays()
+        counts, refused, parse_errors = self._count_matrix(steps, columns)
+
+        # Calls made earlier in the same episode: a global running sum minus the sum at the
+        # episode's first step.
+        lengths = np.array([len(trajectory) for trajectory in trajectories])
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        before = np.cumsum(counts, axis=0) - counts
+        before -= np.repeat(before[starts[lengths > 0]], lengths[lengths > 0], axis=0)
+
+        per_tool = self._apply_policies(counts, before + counts, reward_per_call, overuse_penalty, allowed)
+        rewards = self._finish(per_tool.sum(axis=1), refused, parse_errors)
+
+        results: List[List[float]] = []
+        for start, length in zip(starts.tolist(), lengths.tolist()):
+            results.append(rewards[start : start + length])
+        return results
+
+    def _score_trajectory(self, trajectory: Sequence[Action]) -> List[float]:
+        """`score_trajectories` for one episode without NumPy."""
+
+        used: Counter[str] = Counter()
+        rewards: List[float] = []
+        for action in trajectory:
+            if action.refusal:
+                rewards.append(self._clamp(self.parse_error_penalty))
+                continue
+
+            counts, refused = self._collect_call_stats(action)
+            reward = refused * self.penalty_for_refused
+            for name, count in counts.items():
+                policy = self.tool_policies.get(name, None)
+                if not policy:  # ignore calls to tools without a policy
+                    continue
+                used[name] += count
+                allowed = max(0, policy.max_calls) if policy.max_calls is not None else used[name]
+                if used[name] <= allowed:
+                    reward += count * policy.reward_per_call
+                else:
+                    reward += min(count, used[name] - allowed) * policy.overuse_penalty
+            rewards.append(self._clamp(reward))
+        return rewards
@@ -1,7 +1,18 @@
 """Result reward strategies grouped under the result_rewards namespace."""
 
-from .base import ResultRewardStrategy
+from .base import ResultRewardStrategy, TransientScore
+from .hub.cached import CachedResultReward
+from .hub.composite import CompositeReward, RewardComponent
 from .hub.grm import GRMJudgeReward
 from .hub.matching import MatchingReward, MathMatchingReward
 
-__all__ = ["ResultRewardStrategy", "MatchingReward", "MathMatchingReward", "GRMJudgeReward"]
+__all__ = [
+    "ResultRewardStrategy",
+    "TransientScore",
+    "MatchingReward",
+    "MathMatchingReward",
+    "GRMJudgeReward",
+    "CompositeReward",
+    "RewardComponent",
+    "CachedResultReward",
+]
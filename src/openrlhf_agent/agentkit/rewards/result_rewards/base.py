@@ -2,14 +2,37 @@
 
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from typing import Any, ClassVar, FrozenSet, List, Optional, Sequence
 
 from openrlhf_agent.utils.types import Action, RewardSample
 
 
+class TransientScore(float):
+    """A reward produced by a transient failure (judge outage, grading timeout).
+
+    It is an ordinary float to the training loop, but caches must not keep it: the same answer
+    may score differently once the failure is gone.
+    """
+
+
 class ResultRewardStrategy(ABC):
-    """Scores the final user-visible reply."""
+    """Scores the final user-visible reply.
+
+    `NON_SCORING_FIELDS` lists config fields that do not change any score (pool sizes, timeouts
+    of retried calls, cache sizes); persistent caches leave them out of the strategy fingerprint.
+    Strategies whose score depends on `sample.question` set `USES_QUESTION`, so those caches also
+    key on the question.
+    """
+
+    NON_SCORING_FIELDS: ClassVar[FrozenSet[str]] = frozenset()
+    USES_QUESTION: ClassVar[bool] = False
+
+    def uses_question(self) -> bool:
+        """Whether the score can depend on `sample.question`."""
+
+        return self.USES_QUESTION
 
     @abstractmethod
     async def score(
@@ -21,6 +44,33 @@ class ResultRewardStrategy(ABC):
     ) -> float:
         """Return the reward for the assistant's final response."""
 
+    async def score_batch(
+        self,
+        *,
+        actions: Sequence[Action],
+        labels: Sequence[Optional[Any]],
+        samples: Optional[Sequence[Optional[RewardSample]]] = None,
+    ) -> List[float]:
+        """Score many final responses at once, returning rewards in input order.
+
+        Strategies that can share work across items (batched judge calls, pooled grading)
+        override this; the default runs `score` concurrently for every item.
+        """
+
+        if samples is None:
+            samples = [None] * len(actions)
+        if not len(actions) == len(labels) == len(samples):
+            raise ValueError("actions, labels and samples must have the same length")
+
+        return list(
+            await asyncio.gather(
+                *(
+                    self.score(action=action, label=label, sample=sample)
+                    for action, label, sample in zip(actions, labels, samples)
+                )
+            )
+        )
+
     def extract_final_response(self, action: Action) -> Optional[str]:
         """Return the assistant-visible final response from an action."""
 
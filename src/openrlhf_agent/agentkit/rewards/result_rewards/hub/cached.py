@@ -0,0 +1,183 @@
+"""Persistent result cache in front of any result reward strategy."""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from openrlhf_agent.utils.cache import SQLiteKVStore, make_cache_key
+from openrlhf_agent.utils.types import Action, RewardSample
+from openrlhf_agent.agentkit.rewards.result_rewards.base import ResultRewardStrategy
+from openrlhf_agent.agentkit.rewards.result_rewards.hub.verdict_cache import VerdictCache
+
+
+def _dump_messages(messages: Any) -> Any:
+    if not isinstance(messages, (list, tuple)):
+        return messages
+    return [m.model_dump(exclude_none=True) if hasattr(m, "model_dump") else m for m in messages]
+
+
+def describe_strategy(value: Any) -> Any:
+    """JSON-able description of everything in `value` that can change a score.
+
+    Dataclasses contribute their init fields except repr-hidden ones and `NON_SCORING_FIELDS`,
+    recursively (so a `CompositeReward` covers its components); other objects need a stable repr.
+    """
+
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        skipped = getattr(value, "NON_SCORING_FIELDS", frozenset())
+        return [
+            type(value).__qualname__,
+            {
+                item.name: describe_strategy(getattr(value, item.name))
+                for item in dataclasses.fields(value)
+                if item.init and item.repr and item.name not in skipped
+            },
+        ]
+    if isinstance(value, (list, tuple)):
+        return [describe_strategy(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): describe_strategy(item) for key, item in value.items()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    described = repr(value)
+    if " at 0x" in described:
+        raise ValueError(f"{type(value).__name__} has no stable repr; pass fingerprint= to CachedResultReward.")
+    return described
+
+
+@dataclass
+class CachedResultReward(ResultRewardStrategy):
+    """Reuse rewards of identical final answers across runs and processes.
+
+    Scores are stored under (strategy fingerprint, label, final response) in an in-memory LRU
+    backed by `store`, a size-bounded `SQLiteKVStore` that every process on the node can share,
+    so evaluation reruns and resumed training skip judge and sympy work for answers seen before.
+    Concurrent identical misses share one `score` call. `TransientScore`s (judge outages,
+    grading timeouts) are returned but never stored.
+
+    The fingerprint defaults to a hash of `describe_strategy(strategy)`: the config fields that
+    can change a score, so a new prompt or judge model starts a fresh key space while pool sizes,
+    concurrency and timeouts (`NON_SCORING_FIELDS`) do not. Pass `fingerprint` for strategies that
+    are not dataclasses. `include_question` adds the question to the key; it defaults to
+    `strategy.uses_question()` (true for `GRMJudgeReward` and composites containing one) and
+    cannot be turned off for such strategies.
+    """
+
+    strategy: ResultRewardStrategy
+    store: Optional[SQLiteKVStore] = field(default=None, repr=False, compare=False)
+    fingerprint: Optional[str] = None
+    include_question: Optional[bool] = None
+    memory_entries: int = 100_000
+
+    _cache: Optional[VerdictCache] = field(default=None, init=False, repr=False, compare=False)
+    _stats: Counter = field(default_factory=Counter, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if self.include_question is None:
+            self.include_question = self.strategy.uses_question()
+        elif not self.include_question and self.strategy.uses_question():
+            raise ValueError(
+                f"{type(self.strategy).__name__} reads the question; CachedResultReward needs include_question=True."
+            )
+        if self.fingerprint is None:
+            self.fingerprint = make_cache_key(describe_strategy(self.strategy))[:24]
+        self._cache = VerdictCache(max_entries=self.memory_entries, store=self.store)
+
+    def uses_question(self) -> bool:
+        return self.strategy.uses_question()
+
+    def _key(self, action: Action, label: Any, sample: Optional[RewardSample]) -> Optional[str]:
+        """Cache key of one item, or `None` when it is not worth caching (no label or final answer)."""
+
+        response = self.extract_final_response(action)
+        if label is None or response is None:
+            return None
+        parts = [self.fingerprint, make_cache_key(label), make_cache_key(response)]
+        if self.include_question:
+            parts.append(make_cache_key(_dump_messages(sample.question) if sample is not None else None))
+        return make_cache_key(*parts)
+
+    async def score(
+        self,
+        *,
+        action: Action,
+        label: Optional[Any],
+        sample: Optional[RewardSample] = None,
+    ) -> float:
+        key = self._key(action, label, sample)
+        if key is None:
+            return await self.strategy.score(action=action, label=label, sample=sample)
+
+        async def compute() -> float:
+            self._stats["misses"] += 1
+            return await self.strategy.score(action=action, label=label, sample=sample)
+
+        self._stats["lookups"] += 1
+        return await self._cache.get_or_compute(key, compute)
+
+    async def score_batch(
+        self,
+        *,
+        actions: Sequence[Action],
+        labels: Sequence[Optional[Any]],
+        samples: Optional[Sequence[Optional[RewardSample]]] = None,
+    ) -> List[float]:
+        """Serve hits from the cache and score the distinct misses with one wrapped `score_batch` call."""
+
+        if samples is None:
+            samples = [None] * len(actions)
+        if not len(actions) == len(labels) == len(samples):
+            raise ValueError("actions, labels and samples must have the same length")
+
+        keys = [self._key(action, label, sample) for action, label, sample in zip(actions, labels, samples)]
+        cached = [index for index, key in enumerate(keys) if key is not None]
+        uncached = [index for index, key in enumerate(keys) if key is None]
+        first: Dict[str, int] = {}
+        for index in cached:
+            first.setdefault(keys[index], index)
+
+        async def score_items(items: List[int]) -> List[float]:
+            if not items:
+                return []
+            return list(
+                await self.strategy.score_batch(
+                    actions=[actions[i] for i in items],
+                    labels=[labels[i] for i in items],
+                    samples=[samples[i] for i in items],
+                )
+            )
+
+        async def compute_many(missing: List[str]) -> List[float]:
+            # Distinct misses nobody else is computing: one wrapped `score_batch` call.
+            self._stats["misses"] += len(missing)
+            return await score_items([first[key] for key in missing])
+
+        self._stats["lookups"] += len(cached)
+        cached_values, uncached_values = await asyncio.gather(
+            self._cache.get_or_compute_many([keys[i] for i in cached], compute_many),
+            score_items(uncached),
+        )
+
+        rewards: List[float] = [0.0] * len(actions)
+        for index, value in zip(cached, cached_values):
+            rewards[index] = value
+        for index, value in zip(uncached, uncached_values):
+            rewards[index] = value
+        return rewards
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookups, misses (wrapped strategy calls), hit rate, and the cache's own counters."""
+
+        lookups, misses = self._stats["lookups"], self._stats["misses"]
+        return {
+            "fingerprint": self.fingerprint,
+            "lookups": lookups,
+            "misses": misses,
+            "hit_rate": 1.0 - misses / lookups if lookups else 0.0,
+            "cache": self._cache.stats(),
+            "store_entries": len(self.store) if self.store is not None else 0,
+        }
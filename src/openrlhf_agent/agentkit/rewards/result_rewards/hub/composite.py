@@ -0,0 +1,284 @@
+"""Result reward that combines several strategies and runs them concurrently."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from openrlhf_agent.agentkit.rewards.result_rewards.base import ResultRewardStrategy, TransientScore
+from openrlhf_agent.utils.types import Action, RewardSample
+
+AGGREGATES = ("weighted_mean", "weighted_sum", "max", "majority")
+
+
+@dataclass
+class RewardComponent:
+    """One sub-strategy of a `CompositeReward`.
+
+    `tier` orders components: tier 0 runs first, and a higher tier only runs when no component
+    of the tiers before it passed (e.g. exact matching in tier 0, a GRM judge in tier 1). A score
+    passes when it reaches `pass_threshold`, which defaults to the strategy's `correct_score`.
+    """
+
+    strategy: ResultRewardStrategy
+    weight: float = 1.0
+    tier: int = 0
+    name: Optional[str] = None
+    pass_threshold: Optional[float] = None
+
+    def passes(self, value: float) -> bool:
+        threshold = self.pass_threshold
+        if threshold is None:
+            threshold = getattr(self.strategy, "correct_score", 1.0)
+        return value >= threshold
+
+
+@dataclass
+class CompositeReward(ResultRewardStrategy):
+    """Weighted combination of result strategies with short-circuit rules.
+
+    Components of one tier run concurrently; the reward is the aggregate of the deciding tier,
+    i.e. the first tier with a passing component, or the last tier that ran. Aggregates:
+
+    - `weighted_mean` / `weighted_sum` / `max` over the component scores of that tier;
+    - `majority`: `pass_score` once components holding more than half of the tier's weight
+      pass, `fail_score` once that can no longer happen; still-running components are cancelled.
+
+    `score_details` returns the per-component breakdown and `stats()` aggregates timing, scores
+    and pass rates per component.
+    """
+
+    components: Sequence[RewardComponent] = ()
+    aggregate: str = "weighted_mean"
+    pass_score: float = 1.0
+    fail_score: float = 0.0
+
+    _names: List[str] = field(default_factory=list, init=False, repr=False, compare=False)
+    _stats: Dict[str, Counter] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if not self.components:
+            raise ValueError("CompositeReward requires at least one component.")
+        if self.aggregate not in AGGREGATES:
+            raise ValueError(f"aggregate must be one of {AGGREGATES}, got {self.aggregate!r}.")
+
+        self.components = list(self.components)
+        seen: Counter = Counter()
+        for component in self.components:
+            base = component.name or type(component.strategy).__name__
+            seen[base] += 1
+            self._names.append(base if seen[base] == 1 else f"{base}_{seen[base]}")
+        self._stats = {name: Counter() for name in self._names}
+
+    def uses_question(self) -> bool:
+        return any(component.strategy.uses_question() for component in self.components)
+
+    def _tiers(self) -> List[List[int]]:
+        tiers: Dict[int, List[int]] = {}
+        for index, component in enumerate(self.components):
+            tiers.setdefault(component.tier, []).append(index)
+        return [tiers[tier] for tier in sorted(tiers)]
+
+    def _majority_decided(self, indices: Sequence[int], scores: Dict[int, float]) -> Optional[bool]:
+        total = passed = failed = 0.0
+        for i in indices:
+            weight = self.components[i].weight
+            total += weight
+            if i in scores:
+                if self.components[i].passes(scores[i]):
+                    passed += weight
+                else:
+                    failed += weight
+        if passed > total / 2:
+            return True
+        if failed >= total / 2:
+            return False
+        return None
+
+    def _tier_passed(self, indices: Sequence[int], scores: Dict[int, float]) -> bool:
+        if self.aggregate == "majority":
+            return bool(self._majority_decided(indices, scores))
+        return any(self.components[i].passes(value) for i, value in scores.items())
+
+    def _combine(self, indices: Sequence[int], scores: Dict[int, float]) -> float:
+        done = [i for i in indices if i in scores]
+        if self.aggregate == "majority":
+            return self.pass_score if self._majority_decided(indices, scores) else self.fail_score
+        if not done:
+            return self.fail_score
+        if self.aggregate == "max":
+            return max(scores[i] for i in done)
+        weighted = sum(self.components[i].weight * scores[i] for i in done)
+        if self.aggregate == "weighted_sum":
+            return weighted
+        total_weight = sum(self.components[i].weight for i in done)
+        return weighted / total_weight if total_weight else self.fail_score
+
+    async def _timed_score(self, index: int, action: Action, label: Any, sample: Optional[RewardSample]):
+        started = time.perf_counter()
+        value = await self.components[index].strategy.score(action=action, label=label, sample=sample)
+        return value, time.perf_counter() - started
+
+    async def _run_tier(
+        self, indices: Sequence[int], action: Action, label: Any, sample: Optional[RewardSample]
+    ) -> Tuple[Dict[int, float], Dict[int, float]]:
+        """Run one tier; return scores and seconds of the components that finished."""
+
+        tasks = {asyncio.ensure_future(self._timed_score(i, action, label, sample)): i for i in indices}
+        scores: Dict[int, float] = {}
+        seconds: Dict[int, float] = {}
+        pending = set(tasks)
+        try:
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    scores[tasks[task]], seconds[tasks[task]] = task.result()
+                if self.aggregate == "majority" and pending and self._majority_decided(indices, scores) is not None:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+        return scores, seconds
+
+    async def score_details(
+        self,
+        *,
+        action: Action,
+        label: Optional[Any],
+        sample: Optional[RewardSample] = None,
+    ) -> Tuple[float, Dict[str, Dict[str, Any]]]:
+        """Return the reward and each component's status (scored/skipped/cancelled), score and seconds."""
+
+        details: Dict[str, Dict[str, Any]] = {}
+        reward = self.fail_score
+        tiers = self._tiers()
+        for position, indices in enumerate(tiers):
+            scores, seconds = await self._run_tier(indices, action, label, sample)
+            for i in indices:
+                if i in scores:
+                    details[self._names[i]] = {"status": "scored", "score": scores[i], "seconds": seconds[i]}
+                else:
+                    details[self._names[i]] = {"status": "cancelled", "score": None, "seconds": None}
+            reward = self._combine(indices, scores)
+            if self._tier_passed(indices, scores):
+                for later in tiers[position + 1 :]:
+                    for i in later:
+                        details[self._names[i]] = {"status": "skipped", "score": None, "seconds": None}
+                break
+
+        self._record(details)
+        return self._carry_transient(reward, details), details
+
+    @staticmethod
+    def _carry_transient(reward: float, details: Dict[str, Dict[str, Any]]) -> float:
+        """Mark the reward transient when any component that ran failed transiently."""
+
+        if any(isinstance(entry["score"], TransientScore) for entry in details.values()):
+            return TransientScore(reward)
+        return reward
+
+    def _record(self, details: Dict[str, Dict[str, Any]]) -> None:
+        for index, name in enumerate(self._names):
+            entry = details[name]
+            counter = self._stats[name]
+            counter[entry["status"]] += 1
+            if entry["status"] == "scored":
+                counter["seconds"] += entry["seconds"]
+                counter["score_sum"] += entry["score"]
+                counter["passes"] += int(self.components[index].passes(entry["score"]))
+
+    async def score(
+        self,
+        *,
+        action: Action,
+        label: Optional[Any],
+        sample: Optional[RewardSample] = None,
+    ) -> float:
+        reward, _ = await self.score_details(action=action, label=label, sample=sample)
+        return reward
+
+    async def score_batch(
+        self,
+        *,
+        actions: Sequence[Action],
+        labels: Sequence[Optional[Any]],
+        samples: Optional[Sequence[Optional[RewardSample]]] = None,
+    ) -> List[float]:
+        """Run each tier as one `score_batch` call per component over the items still undecided.
+
+        Sub-strategies keep their own batching (pooled grading, batched judge calls). `majority`
+        needs per-item cancellation, so it scores items one by one instead.
+        """
+
+        if self.aggregate == "majority":
+            return await super().score_batch(actions=actions, labels=labels, samples=samples)
+        if samples is None:
+            samples = [None] * len(actions)
+        if not len(actions) == len(labels) == len(samples):
+            raise ValueError("actions, labels and samples must have the same length")
+
+        rewards = [self.fail_score] * len(actions)
+        details: List[Dict[str, Dict[str, Any]]] = [{} for _ in actions]
+        pending = list(range(len(actions)))
+
+        async def run(index: int, items: List[int]) -> Tuple[List[float], float]:
+            started = time.perf_counter()
+            values = await self.components[index].strategy.score_batch(
+                actions=[actions[j] for j in items],
+                labels=[labels[j] for j in items],
+                samples=[samples[j] for j in items],
+            )
+            return list(values), time.perf_counter() - started
+
+        skipped = {"status": "skipped", "score": None, "seconds": None}
+        for indices in self._tiers():
+            active = set(pending)
+            for item, item_details in enumerate(details):
+                if item not in active:
+                    item_details.update({self._names[i]: dict(skipped) for i in indices})
+            if not pending:
+                continue
+
+            results = await asyncio.gather(*(run(i, pending) for i in indices))
+            still_pending = []
+            for position, item in enumerate(pending):
+                scores = {i: values[position] for i, (values, _) in zip(indices, results)}
+                for i, (_, elapsed) in zip(indices, results):
+                    # One batch call served every pending item; charge each an equal share.
+                    details[item][self._names[i]] = {
+                        "status": "scored",
+                        "score": scores[i],
+                        "seconds": elapsed / len(pending),
+                    }
+                rewards[item] = self._combine(indices, scores)
+                if not self._tier_passed(indices, scores):
+                    still_pending.append(item)
+            pending = still_pending
+
+        for item_details in details:
+            self._record(item_details)
+        return [self._carry_transient(reward, item_details) for reward, item_details in zip(rewards, details)]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per component: scored/skipped/cancelled counts, mean seconds, mean score and pass rate."""
+
+        summary: Dict[str, Dict[str, Any]] = {}
+        for name in self._names:
+            counter = self._stats[name]
+            scored = counter["scored"]
+            summary[name] = {
+                "scored": scored,
+                "skipped": counter["skipped"],
+                "cancelled": counter["cancelled"],
+                "mean_seconds": counter["seconds"] / scored if scored else 0.0,
+                "mean_score": counter["score_sum"] / scored if scored else 0.0,
+                "pass_rate": counter["passes"] / scored if scored else 0.0,
+            }
+        return summary
+
+    def reset_stats(self) -> None:
+        for counter in self._stats.values():
+            counter.clear()
@@ -4,15 +4,18 @@ from __future__ import annotations
 
 import json
 import logging
+import math
 import re
-from dataclasses import dataclass
-from typing import Any, Iterable, Mapping, Optional
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
 
 from jinja2 import Environment
 
-from openai import AsyncOpenAI
-
-from openrlhf_agent.agentkit.rewards.result_rewards.base import ResultRewardStrategy
+from openrlhf_agent.agentkit.rewards.result_rewards.base import ResultRewardStrategy, TransientScore
+from openrlhf_agent.agentkit.rewards.result_rewards.hub.judge_client import JudgeClient
+from openrlhf_agent.agentkit.rewards.result_rewards.hub.judge_prompt import PromptCompactor, strip_reasoning
+from openrlhf_agent.agentkit.rewards.result_rewards.hub.verdict_cache import VerdictCache
+from openrlhf_agent.utils.cache import SQLiteKVStore, make_cache_key
 from openrlhf_agent.utils.types import Action, RewardSample
 
 
@@ -37,7 +40,29 @@ Output your judgment strictly as: [[Yes]] if the assistant’s response is consi
 [The End of Assistant's Response]
 """.strip()
 
+# Short-verdict mode: the verdict is the first generated token, read from its top logprobs.
+SHORT_VERDICT_PROMPT_TEMPLATE = """
+Act as an impartial evaluator to determine whether an AI assistant’s response is consistent with—or exceeds—the quality of a provided reference answer to a given question.
+Consider the following factors: helpfulness, relevance, accuracy, depth, creativity, harmlessness, and overall quality. Analyze these dimensions based on the specific problem, as different tasks may emphasize different criteria.
+Avoid biases related to the position of responses, response length, or assistant names. Be objective in your assessment.
+Reply with a single word and no explanation: Yes if the assistant’s response is consistent with or better than the reference answer, No otherwise.
+
+[User Question]
+{question}
+
+[The Start of Reference Answer]
+{label}
+[The End of Reference Answer]
+
+[The Start of Assistant's Response]
+{response}
+[The End of Assistant's Response]
+
+Verdict (Yes or No):
+""".strip()
+
 VERDICT_PATTERN = re.compile(r"\[\[(Yes|No)\]\]", re.IGNORECASE)
+SHORT_VERDICT_PATTERN = re.compile(r"^\W*(Yes|No)\b", re.IGNORECASE)
 
 _PROMPT_ENV = Environment(autoescape=False, trim_blocks=True, lstrip_blocks=True)
 
@@ -106,7 +131,12 @@ _QUESTION_TEMPLATE = _PROMPT_ENV.from_string(
 )
 
 
-def _normalize_messages(payload: Iterable[Any]) -> list[dict[str, str]]:
+def _normalize_messages(
+    payload: Iterable[Any],
+    *,
+    include_tool_calls: bool = True,
+    drop_reasoning: bool = False,
+) -> list[dict[str, str]]:
     normalized: list[dict[str, str]] = []
     for entry in payload:
         if entry is None:
@@ -119,10 +149,19 @@ def _normalize_messages(payload: Iterable[Any]) -> list[dict[str, str]]:
         else:
             continue
 
+        content = data.get("content")
+        if drop_reasoning and isinstance(content, str):
+            content = strip_reasoning(content)
+        if not include_tool_calls:
+            # Tool results go with the calls that produced them.
+            if data.get("role") == "tool" or (data.get("tool_calls") and not content):
+                continue
+            data["tool_calls"] = None
+
         normalized.append(
             {
                 "role": data.get("role"),
-                "content": data.get("content"),
+                "content": content,
                 "tool_calls": [
                     rendered for rendered in (
                         _render_tool_call_payload(call)
@@ -134,7 +173,12 @@ def _normalize_messages(payload: Iterable[Any]) -> list[dict[str, str]]:
     return normalized
 
 
-def render_question_from_sample(sample: Optional[RewardSample]) -> str:
+def render_question_from_sample(
+    sample: Optional[RewardSample],
+    *,
+    include_tool_calls: bool = True,
+    drop_reasoning: bool = False,
+) -> str:
     if not sample or not sample.question:
         return ""
 
@@ -142,7 +186,9 @@ def render_question_from_sample(sample: Optional[RewardSample]) -> str:
     if isinstance(question_payload, str):
         return question_payload.strip()
 
-    formatted_messages = _normalize_messages(question_payload)
+    formatted_messages = _normalize_messages(
+        question_payload, include_tool_calls=include_tool_calls, drop_reasoning=drop_reasoning
+    )
     if not formatted_messages:
         return ""
 
@@ -159,52 +205,218 @@ def extract_verdict(text: str) -> Optional[str]:
     return matches[-1] if matches else None
 
 
+def extract_short_verdict(text: str) -> Optional[str]:
+    """Parse a bare leading Yes / No, falling back to the [[Yes]] / [[No]] form."""
+
+    if not text:
+        return None
+
+    match = SHORT_VERDICT_PATTERN.match(text)
+    return match.group(1) if match else extract_verdict(text)
+
+
+def _verdict_word(token: str) -> Optional[str]:
+    word = token.strip().strip("[]*\"'`.:").lower()
+    return word if word in ("yes", "no") else None
+
+
+def extract_verdict_from_logprobs(top_logprobs: List[Dict[str, float]]) -> Optional[Tuple[str, float]]:
+    """Read the verdict at the first position whose most likely token is Yes or No.
+
+    Returns the verdict and P(yes), renormalized over the Yes/No spellings among the candidates
+    at that position (" Yes", "yes", "YES", ...).
+    """
+
+    for candidates in top_logprobs:
+        if not candidates or _verdict_word(max(candidates, key=candidates.get)) is None:
+            continue
+
+        mass = {"yes": 0.0, "no": 0.0}
+        for token, logprob in candidates.items():
+            word = _verdict_word(token)
+            if word is not None:
+                mass[word] += math.exp(logprob)
+        p_yes = mass["yes"] / (mass["yes"] + mass["no"])
+        return ("yes" if p_yes >= 0.5 else "no"), p_yes
+    return None
+
+
 @dataclass
 class GRMJudgeReward(ResultRewardStrategy):
-    """Reward scored by querying an external GRM-compatible endpoint."""
+    """Reward scored by querying an external GRM-compatible endpoint.
+
+    Requests go through the process-wide `JudgeClient` for (`base_url`, `model`), which caps
+    in-flight requests at `max_concurrency` and retries transient failures; `error_score` is only
+    returned once `max_retries` or `deadline` are used up. Instances with the same endpoint and
+    client options share one client. `batch_size > 1` batches prompts into `/completions`
+    calls, with `prompt_format` applying the judge's chat template.
+
+    `verdict_mode="free_form"` lets the judge reason and searches the reply for [[Yes]] / [[No]];
+    `max_tokens` caps that reply (no cap by default; batched `/completions` calls fall back to
+    `BATCH_MAX_TOKENS`). `request_kwargs` (e.g. `temperature`) are sent with every request,
+    on the chat path and the batched `/completions` path alike.
+    `verdict_mode="logprob"` uses `short_prompt_template`, caps generation at `short_max_tokens`
+    and reads the decision and P(yes) from the top logprobs of the first verdict token, falling
+    back to the reply text when the server returns no logprobs. With `use_verdict_confidence`,
+    that mode scores `format_score + (correct_score - format_score) * P(yes)`.
+
+    `question_token_budget`, `label_token_budget` and `response_token_budget` cap each prompt
+    section (middle-out truncation, counted with `judge_tokenizer` or a ~4 chars/token estimate);
+    `drop_tool_calls` removes tool calls and tool results from the question transcript and
+    `drop_reasoning` removes <think> blocks. `compaction_stats()` reports what was cut.
+
+    Verdicts are cached by a hash of (judge model, verdict mode, prompt template, question, label, response)
+    in a process-wide LRU of `verdict_cache_size` entries, persisted to `verdict_store` when one
+    is given, and concurrent identical requests share one judge call. Failed calls are not cached.
+    """
+
+    NON_SCORING_FIELDS: ClassVar[FrozenSet[str]] = frozenset({
+        "api_key", "max_concurrency", "timeout", "max_retries", "deadline",
+        "batch_size", "batch_wait_ms", "verdict_cache_size",
+    })
+    USES_QUESTION: ClassVar[bool] = True
 
     model: Optional[str]
     base_url: Optional[str]
     api_key: Optional[str]
 
     prompt_template: str = CRITIC_PROMPT_TEMPLATE
+    max_tokens: Optional[int] = None
+    request_kwargs: Optional[Dict[str, Any]] = None
+    verdict_mode: str = "free_form"
+    short_prompt_template: str = SHORT_VERDICT_PROMPT_TEMPLATE
+    short_max_tokens: int = 4
+    top_logprobs: int = 5
+    use_verdict_confidence: bool = False
 
     correct_score: float = 1.0
     format_score: float = 0.0
     error_score: float = -0.1
 
-    def __post_init__(self) -> None:
-        self._base_url = self.base_url
-        self._api_key = self.api_key
-        self._model = self.model
+    max_concurrency: int = 64
+    timeout: float = 60.0
+    max_retries: int = 3
+    deadline: Optional[float] = 300.0
+    batch_size: int = 1
+    batch_wait_ms: float = 10.0
+    prompt_format: str = "{prompt}"
+
+    question_token_budget: Optional[int] = None
+    label_token_budget: Optional[int] = None
+    response_token_budget: Optional[int] = None
+    drop_tool_calls: bool = False
+    drop_reasoning: bool = False
+    judge_tokenizer: Optional[str] = None
 
-        client_kwargs: dict[str, Any] = {
-            "base_url": self._base_url,
-            "api_key": self._api_key
-        }
+    verdict_cache_size: int = 100_000
+    verdict_store: Optional[SQLiteKVStore] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if self.verdict_mode not in ("free_form", "logprob"):
+            raise ValueError(f"verdict_mode must be 'free_form' or 'logprob', got {self.verdict_mode!r}.")
+
+        self._client = JudgeClient.shared(
+            model=self.model,
+            base_url=self.base_url,
+            api_key=self.api_key,
+            max_concurrency=self.max_concurrency,
+            timeout=self.timeout,
+            max_retries=self.max_retries,
+            deadline=self.deadline,
+            batch_size=self.batch_size,
+            batch_wait_ms=self.batch_wait_ms,
+            prompt_format=self.prompt_format,
+        )
+        self._compactor = PromptCompactor(
+            question_tokens=self.question_token_budget,
+            label_tokens=self.label_token_budget,
+            response_tokens=self.response_token_budget,
+            drop_reasoning=self.drop_reasoning,
+            tokenizer_path=self.judge_tokenizer,
+        )
+        self._verdict_cache = (
+            VerdictCache.shared(max_entries=self.verdict_cache_size, store=self.verdict_store)
+            if self.verdict_cache_size > 0 or self.verdict_store is not None
+            else None
+        )
 
-        self._client = AsyncOpenAI(**client_kwargs)
+    @property
+    def active_prompt_template(self) -> str:
+        return self.short_prompt_template if self.verdict_mode == "logprob" else self.prompt_template
 
     def _prepare_prompt(self, *, question: str, label: str, response: str) -> str:
-        return self.prompt_template.format(question=question, label=label, response=response)
+        return self.active_prompt_template.format(question=question, label=label, response=response)
+
+    def _request_options(self, max_tokens: Optional[int]) -> Dict[str, Any]:
+        # Sent on every call, so prompts with different options are never batched together.
+        options = dict(self.request_kwargs or {})
+        if max_tokens is not None:
+            options["max_tokens"] = max_tokens
+        return options
 
     async def _score_with_judge(self, prompt: str) -> Optional[str]:
         """Send the prompt to the external judge model."""
 
-        try:
-            reply = await self._client.chat.completions.create(
-                model=self._model,
-                messages=[{"role": "user", "content": prompt}],
+        return await self._client.complete(prompt, **self._request_options(self.max_tokens))
+
+    def judge_stats(self) -> Dict[str, Any]:
+        """Queueing, latency, retry and batching metrics of the shared judge client."""
+
+        return self._client.stats()
+
+    def compaction_stats(self) -> Dict[str, Any]:
+        """Truncation counts and per-section token totals before and after compaction."""
+
+        return self._compactor.stats()
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Hit, dedup and judge-call counters of the verdict cache, or `None` when it is off."""
+
+        return self._verdict_cache.stats() if self._verdict_cache is not None else None
+
+    async def _judge_verdict(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Return {"verdict": "yes" | "no" | "", "p_yes": float | None}, or `None` when the call failed.
+
+        An empty verdict means the reply had no parsable decision; `p_yes` is only set from logprobs.
+        """
+
+        if self.verdict_mode == "logprob":
+            reply = await self._client.request(
+                prompt, top_logprobs=self.top_logprobs, **self._request_options(self.short_max_tokens)
             )
-        except Exception as exc:  # pragma: no cover - runtime error path
-            logger.warning("GRM judge request failed: %s", exc)
-            return None
+            if reply is None or not (reply.text or reply.top_logprobs):
+                return None
+
+            parsed = extract_verdict_from_logprobs(reply.top_logprobs or [])
+            if parsed is not None:
+                return {"verdict": parsed[0], "p_yes": parsed[1]}
+            verdict = extract_short_verdict(reply.text)
+            return {"verdict": verdict.lower() if verdict is not None else "", "p_yes": None}
 
-        if not reply.choices:
+        verdict_text = await self._score_with_judge(prompt)
+        if not verdict_text:
             return None
 
-        content = reply.choices[0].message.content or ""
-        return content.strip() or None
+        verdict = extract_verdict(verdict_text)
+        return {"verdict": verdict.lower() if verdict is not None else "", "p_yes": None}
+
+    async def _cached_verdict(self, *, question: str, label: Any, response: str) -> Optional[Dict[str, Any]]:
+        prompt = self._prepare_prompt(question=question, label=label, response=response)
+        if self._verdict_cache is None:
+            return await self._judge_verdict(prompt)
+
+        key = make_cache_key(
+            "grm_verdict",
+            self.model,
+            self.verdict_mode,
+            self.active_prompt_template,
+            self.max_tokens if self.verdict_mode == "free_form" else self.short_max_tokens,
+            self.request_kwargs,
+            question,
+            label,
+            response,
+        )
+        return await self._verdict_cache.get_or_compute(key, lambda: self._judge_verdict(prompt))
 
     async def score(
         self,
@@ -219,22 +431,21 @@ class GRMJudgeReward(ResultRewardStrategy):
         if not response:
             return self.error_score
 
-        question_text = render_question_from_sample(sample)
-        prompt = self._prepare_prompt(question=question_text, label=label, response=response)
-        verdict_text = await self._score_with_judge(prompt)
-        if not verdict_text:
-            return self.error_score
-
-        verdict = extract_verdict(verdict_text)
-        if verdict is None:
-            return self.format_score
+        question_text = render_question_from_sample(
+            sample, include_tool_calls=not self.drop_tool_calls, drop_reasoning=self.drop_reasoning
+        )
+        if self._compactor.enabled:
+            question_text, label, response = self._compactor.compact(
+                question=question_text, label=label, response=response
+            )
+        result = await self._cached_verdict(question=question_text, label=label, response=response)
+        if result is None:
+            return TransientScore(self.error_score)
 
-        verdict_lower = verdict.lower()
-        if verdict_lower == "yes":
+        if self.use_verdict_confidence and result["p_yes"] is not None:
+            return self.format_score + (self.correct_score - self.format_score) * result["p_yes"]
+        if result["verdict"] == "yes":
             return self.correct_score
-        if verdict_lower == "no":
-            return self.format_score
-
         return self.format_score
 
 
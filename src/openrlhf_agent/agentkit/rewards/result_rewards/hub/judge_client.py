@@ -0,0 +1,325 @@
+"""Shared, rate-limited client for GRM judge endpoints.
+
+Every `GRMJudgeReward` talks to the judge through one `JudgeClient` per (endpoint, model, client
+options) in the process, so the in-flight cap holds across all agent instances:
+
+- `max_concurrency` requests (or batches) are in flight at once per event loop; the rest wait;
+- connection errors, timeouts, 429s and 5xx are retried with exponential backoff and full jitter
+  until `max_retries` or the per-prompt `deadline` runs out;
+- with `batch_size > 1`, prompts that arrive within `batch_wait_ms` of each other are sent as one
+  `/completions` call with a list prompt (vLLM and SGLang accept this), wrapped by `prompt_format`
+  since that endpoint does not apply the chat template. Its server-side `max_tokens` default is
+  tiny (16 on OpenAI-compatible servers), so batched calls send `BATCH_MAX_TOKENS` unless the
+  caller sets a limit; chat calls send none unless asked.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import openai
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+_RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+BATCH_MAX_TOKENS = 1024
+
+_SHARED_CLIENTS: Dict[Tuple[Any, ...], "JudgeClient"] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+@dataclass
+class JudgeReply:
+    """Text of one judge completion and, when requested, the top log-probabilities per token."""
+
+    text: str
+    top_logprobs: Optional[List[Dict[str, float]]] = None
+
+
+class _BatchItem(NamedTuple):
+    prompt: str
+    top_logprobs: int
+    kwargs: Dict[str, Any]
+    enqueued: float
+    future: asyncio.Future
+
+
+def _percentiles(samples: Deque[float]) -> Dict[str, float]:
+    if not samples:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    return {
+        "mean": sum(ordered) / len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "max": ordered[-1],
+    }
+
+
+class JudgeClient:
+    """Concurrency-limited, retrying chat/completions client with optional prompt batching."""
+
+    def __init__(
+        self,
+        *,
+        model: Optional[str],
+        base_url: Optional[str],
+        api_key: Optional[str],
+        max_concurrency: int = 64,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        deadline: Optional[float] = 300.0,
+        batch_size: int = 1,
+        batch_wait_ms: float = 10.0,
+        prompt_format: str = "{prompt}",
+        request_kwargs: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.model = model
+        self.timeout = float(timeout)
+        self.max_retries = int(max_retries)
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.deadline = deadline
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.prompt_format = prompt_format
+        self.request_kwargs = dict(request_kwargs or {})
+
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_concurrency = max(1, int(max_concurrency))
+        # The HTTP client and the semaphore bind to the event loop that first uses them, so each
+        # loop gets its own pair (the cap then holds per loop).
+        self._per_loop: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._batcher_loop: Optional[asyncio.AbstractEventLoop] = None
+        # The loop keeps only weak references to tasks; in-flight batches are held here.
+        self._batch_tasks: set = set()
+
+        self._stats: Counter = Counter()
+        self._batch_sizes: Counter = Counter()
+        self._queue_seconds: Deque[float] = deque(maxlen=10_000)
+        self._latency_seconds: Deque[float] = deque(maxlen=10_000)
+        self._in_flight = 0
+        self._max_in_flight = 0
+
+    @classmethod
+    def shared(cls, *, model: Optional[str], base_url: Optional[str], api_key: Optional[str], **options: Any):
+        """Return the process-wide client for this endpoint, model and options, creating it on first use."""
+
+        key = (base_url, model, api_key, repr(sorted(options.items())))
+        with _SHARED_LOCK:
+            client = _SHARED_CLIENTS.get(key)
+            if client is None:
+                client = _SHARED_CLIENTS[key] = cls(model=model, base_url=base_url, api_key=api_key, **options)
+            return client
+
+    def _loop_state(self) -> Tuple[AsyncOpenAI, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        state = self._per_loop.get(loop)
+        if state is None:
+            # Retries are ours: the SDK's own retries would hold a concurrency slot while sleeping.
+            client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0)
+            state = self._per_loop[loop] = (client, asyncio.Semaphore(self.max_concurrency))
+        return state
+
+    async def complete(self, prompt: str, **request_kwargs: Any) -> Optional[str]:
+        """Return the judge's reply text, or `None` once retries or the deadline are exhausted."""
+
+        reply = await self.request(prompt, **request_kwargs)
+        return reply.text if reply is not None and reply.text else None
+
+    async def request(self, prompt: str, *, top_logprobs: int = 0, **request_kwargs: Any) -> Optional[JudgeReply]:
+        """Return the judge's reply, with the `top_logprobs` most likely tokens per position if asked.
+
+        `request_kwargs` (e.g. `max_tokens`) override the client defaults for this prompt; prompts
+        with the same overrides are batched together.
+        """
+
+        kwargs = {**self.request_kwargs, **request_kwargs}
+        if self.batch_size > 1:
+            return await self._enqueue(prompt, top_logprobs, kwargs)
+        replies = await self._call_with_retries(
+            lambda: self._chat(prompt, top_logprobs, kwargs), time.monotonic(), num_prompts=1
+        )
+        return replies[0] if replies else None
+
+    async def _chat(self, prompt: str, top_logprobs: int, kwargs: Dict[str, Any]) -> List[Optional[JudgeReply]]:
+        if top_logprobs:
+            kwargs = {**kwargs, "logprobs": True, "top_logprobs": top_logprobs}
+        client, _ = self._loop_state()
+        reply = await client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            timeout=self.timeout,
+            **kwargs,
+        )
+        if not reply.choices:
+            return [None]
+
+        choice = reply.choices[0]
+        tokens = None
+        if top_logprobs and choice.logprobs is not None and choice.logprobs.content:
+            tokens = [
+                {candidate.token: candidate.logprob for candidate in position.top_logprobs}
+                for position in choice.logprobs.content
+            ]
+        return [JudgeReply(text=(choice.message.content or "").strip(), top_logprobs=tokens)]
+
+    async def _completions(
+        self, prompts: List[str], top_logprobs: int, kwargs: Dict[str, Any]
+    ) -> List[Optional[JudgeReply]]:
+        if top_logprobs:
+            kwargs = {**kwargs, "logprobs": top_logprobs}
+        if kwargs.get("max_tokens") is None:
+            kwargs = {**kwargs, "max_tokens": BATCH_MAX_TOKENS}
+        client, _ = self._loop_state()
+        reply = await client.completions.create(
+            model=self.model,
+            prompt=[self.prompt_format.format(prompt=prompt) for prompt in prompts],
+            timeout=self.timeout,
+            **kwargs,
+        )
+        replies: List[Optional[JudgeReply]] = [None] * len(prompts)
+        for position, choice in enumerate(reply.choices):
+            index = choice.index if choice.index is not None else position
+            if not 0 <= index < len(replies):
+                continue
+            tokens = None
+            if top_logprobs and choice.logprobs is not None and choice.logprobs.top_logprobs:
+                tokens = [dict(candidates or {}) for candidates in choice.logprobs.top_logprobs]
+            replies[index] = JudgeReply(text=(choice.text or "").strip(), top_logprobs=tokens)
+        return replies
+
+    async def _call_with_retries(
+        self, send, submitted: float, *, num_prompts: int
+    ) -> Optional[List[Optional[JudgeReply]]]:
+        _, semaphore = self._loop_state()
+        attempt = 0
+        while True:
+            queued = time.monotonic()
+            async with semaphore:
+                started = time.monotonic()
+                self._queue_seconds.append(started - queued)
+                self._in_flight += 1
+                self._max_in_flight = max(self._max_in_flight, self._in_flight)
+                try:
+                    replies = await send()
+                except _RETRYABLE_ERRORS as exc:
+                    error: Optional[BaseException] = exc
+                except Exception as exc:  # pragma: no cover - runtime error path
+                    self._stats["failures"] += num_prompts
+                    logger.warning("GRM judge request failed: %s", exc)
+                    return None
+                else:
+                    error = None
+                finally:
+                    self._in_flight -= 1
+                    self._stats["requests"] += 1
+
+            if error is None:
+                self._latency_seconds.append(time.monotonic() - started)
+                self._stats["prompts"] += num_prompts
+                return replies
+
+            if isinstance(error, (openai.APITimeoutError, asyncio.TimeoutError)):
+                self._stats["timeouts"] += 1
+            delay = random.uniform(0.0, min(self.backoff_max, self.backoff_base * 2**attempt))
+            out_of_time = self.deadline is not None and time.monotonic() + delay - submitted > self.deadline
+            if attempt >= self.max_retries or out_of_time:
+                self._stats["failures"] += num_prompts
+                logger.warning("GRM judge request failed after %d attempts: %s", attempt + 1, error)
+                return None
+            attempt += 1
+            self._stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+    async def _enqueue(self, prompt: str, top_logprobs: int, kwargs: Dict[str, Any]) -> Optional[JudgeReply]:
+        loop = asyncio.get_running_loop()
+        if self._batcher is None or self._batcher.done() or self._batcher_loop is not loop:
+            self._queue = asyncio.Queue()
+            self._batcher_loop = loop
+            self._batcher = loop.create_task(self._run_batcher())
+
+        future = loop.create_future()
+        await self._queue.put(_BatchItem(prompt, top_logprobs, kwargs, time.monotonic(), future))
+        return await future
+
+    async def _run_batcher(self) -> None:
+        queue = self._queue
+        while True:
+            items = [await queue.get()]
+            batch_deadline = time.monotonic() + self.batch_wait
+            while len(items) < self.batch_size:
+                remaining = batch_deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # One call per distinct set of request options; sending runs in its own task so the
+            # next batch can form while this one is in flight.
+            groups: Dict[str, List[_BatchItem]] = {}
+            for item in items:
+                groups.setdefault(repr((item.top_logprobs, sorted(item.kwargs.items()))), []).append(item)
+            for group in groups.values():
+                task = asyncio.get_running_loop().create_task(self._send_batch(group))
+                self._batch_tasks.add(task)
+                task.add_done_callback(self._batch_tasks.discard)
+
+    async def _send_batch(self, items: List[_BatchItem]) -> None:
+        prompts = [item.prompt for item in items]
+        top_logprobs, kwargs = items[0].top_logprobs, items[0].kwargs
+        self._batch_sizes[len(items)] += 1
+        submitted = min(item.enqueued for item in items)
+        replies = await self._call_with_retries(
+            lambda: self._completions(prompts, top_logprobs, kwargs), submitted, num_prompts=len(items)
+        )
+        for position, item in enumerate(items):
+            if not item.future.done():
+                item.future.set_result(replies[position] if replies else None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Request counters, queueing and latency distributions (seconds) and batch sizes."""
+
+        return {
+            "requests": self._stats["requests"],
+            "prompts": self._stats["prompts"],
+            "retries": self._stats["retries"],
+            "timeouts": self._stats["timeouts"],
+            "failures": self._stats["failures"],
+            "in_flight": self._in_flight,
+            "max_in_flight": self._max_in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_seconds": _percentiles(self._queue_seconds),
+            "latency_seconds": _percentiles(self._latency_seconds),
+            "batch_sizes": dict(sorted(self._batch_sizes.items())),
+        }
+
+    def reset_stats(self) -> None:
+        self._stats.clear()
+        self._batch_sizes.clear()
+        self._queue_seconds.clear()
+        self._latency_seconds.clear()
+        self._max_in_flight = self._in_flight
@@ -0,0 +1,147 @@
+"""Token-budgeted compaction of GRM judge prompts.
+
+Questions carry the whole transcript (tool calls and tool results included) and responses can be
+arbitrarily long, so judge prompts have no natural size bound. `PromptCompactor` trims each
+section to its own token budget, cutting the middle and keeping the head and tail: the task
+statement and the final answer are what a judge needs most. Token counts come from a Hugging Face
+tokenizer when one is configured and from a ~4 characters per token estimate otherwise.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+TRUNCATION_MARKER = "\n\n[... {count} tokens omitted ...]\n\n"
+
+_REASONING_PATTERN = re.compile(r"<think>.*?</think>\s*", re.DOTALL)
+
+
+def approx_token_count(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used when no tokenizer is configured."""
+
+    return (len(text) + 3) // 4
+
+
+def load_token_counter(tokenizer_path: Optional[str]) -> Callable[[str], int]:
+    """Return a token counter for `tokenizer_path`, or the character estimate when it is `None`."""
+
+    if tokenizer_path is None:
+        return approx_token_count
+
+    try:
+        from transformers import AutoTokenizer
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise ImportError("Exact judge token budgets require `transformers`; unset judge_tokenizer.") from exc
+
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def strip_reasoning(text: str) -> str:
+    """Remove <think>...</think> blocks, and any reasoning before a lone closing tag."""
+
+    text = _REASONING_PATTERN.sub("", text)
+    if "</think>" in text:
+        text = text.split("</think>", 1)[1]
+    return text.strip()
+
+
+def truncate_middle(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> Tuple[str, int, int]:
+    """Cut the middle of `text` until it fits `max_tokens`; return (text, tokens before, tokens after)."""
+
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text, total, total
+
+    # Size the kept characters from the token ratio, then shrink until the tokenizer agrees.
+    keep_chars = int(len(text) * max_tokens / total)
+    while True:
+        marker = TRUNCATION_MARKER.format(count=max(0, total - max_tokens))
+        budget_chars = max(0, keep_chars - len(marker))
+        head = text[: budget_chars - budget_chars // 2]
+        tail = text[len(text) - budget_chars // 2 :] if budget_chars // 2 else ""
+        compacted = head + marker + tail
+        kept = count_tokens(compacted)
+        if kept <= max_tokens or budget_chars == 0:
+            return compacted, total, kept
+        keep_chars = int(keep_chars * 0.9)
+
+
+class PromptCompactor:
+    """Apply per-section token budgets to judge prompts and count what was cut.
+
+    A budget of `None` leaves that section untouched.
+    """
+
+    SECTIONS = ("question", "label", "response")
+
+    def __init__(
+        self,
+        *,
+        question_tokens: Optional[int] = None,
+        label_tokens: Optional[int] = None,
+        response_tokens: Optional[int] = None,
+        drop_reasoning: bool = False,
+        tokenizer_path: Optional[str] = None,
+    ) -> None:
+        self.budgets = {"question": question_tokens, "label": label_tokens, "response": response_tokens}
+        self.drop_reasoning = drop_reasoning
+        self.tokenizer_path = tokenizer_path
+        self._count_tokens: Optional[Callable[[str], int]] = None
+        self._stats: Counter = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.drop_reasoning or any(budget is not None for budget in self.budgets.values())
+
+    def count_tokens(self, text: str) -> int:
+        if self._count_tokens is None:
+            self._count_tokens = load_token_counter(self.tokenizer_path)
+        return self._count_tokens(text)
+
+    def compact(self, *, question: str, label: Any, response: str) -> Tuple[str, str, str]:
+        """Return the (question, label, response) sections trimmed to their budgets."""
+
+        self._stats["prompts"] += 1
+        if self.drop_reasoning:
+            stripped = strip_reasoning(response)
+            if stripped != response:
+                self._stats["reasoning_stripped"] += 1
+                response = stripped
+
+        sections = {"question": question, "label": str(label), "response": response}
+        for name, text in sections.items():
+            budget = self.budgets[name]
+            if budget is None or not text:
+                continue
+            compacted, before, after = truncate_middle(text, budget, self.count_tokens)
+            self._stats[f"{name}_tokens_in"] += before
+            self._stats[f"{name}_tokens_out"] += after
+            if compacted is not text:
+                self._stats[f"{name}_truncated"] += 1
+                sections[name] = compacted
+        return sections["question"], sections["label"], sections["response"]
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-section truncation counts and token totals before and after compaction."""
+
+        prompts = self._stats["prompts"]
+        stats: Dict[str, Any] = {"prompts": prompts, "reasoning_stripped": self._stats["reasoning_stripped"]}
+        for name in self.SECTIONS:
+            if self.budgets[name] is None:
+                continue
+            tokens_in = self._stats[f"{name}_tokens_in"]
+            tokens_out = self._stats[f"{name}_tokens_out"]
+            stats[name] = {
+                "budget": self.budgets[name],
+                "truncated": self._stats[f"{name}_truncated"],
+                "tokens_in": tokens_in,
+                "tokens_out": tokens_out,
+                "saved_ratio": 1.0 - tokens_out / tokens_in if tokens_in else 0.0,
+            }
+        return stats
+
+    def reset_stats(self) -> None:
+        self._stats.clear()
@@ -0,0 +1,139 @@
+"""Precomputed label forms for `MathMatchingReward`.
+
+Every scoring call unboxes and normalizes the gold labels again (memoized per process, but each
+rollout worker starts cold). A label index walks the dataset once and stores, per distinct label,
+the (MathD form, sympy form) pair of each candidate answer. The reward looks labels up by content
+with one dict access, so the dataset itself needs no changes:
+
+    python scripts/build_label_index.py --dataset train.jsonl --output train.labels.json.gz
+    MathMatchingReward(label_index="train.labels.json.gz")
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from openrlhf_agent.agentkit.rewards.result_rewards.hub.math_utils import (
+    mathd_normalize_answer,
+    normalize_answer,
+    normalize_ground_truth,
+)
+
+LABEL_INDEX_FORMAT_VERSION = 2
+
+# (MathD form, sympy form) of one candidate label.
+NormalizedLabel = Tuple[Optional[str], Optional[str]]
+
+
+def candidate_labels(label: Any) -> Sequence[Any]:
+    """The gold answers a label stands for: a string, or a sequence of alternatives."""
+
+    if label is None:
+        raise NotImplementedError("label=None is not supported.")
+
+    if isinstance(label, str):
+        return [label]
+    if isinstance(label, Sequence):
+        return list(label)
+    raise NotImplementedError(f"Unsupported label type: {type(label)!r}")
+
+
+def normalize_labels(candidates: Sequence[Any]) -> List[NormalizedLabel]:
+    """(MathD form, sympy form) of every usable label."""
+
+    normalized = []
+    for gold in candidates:
+        if gold is None:
+            continue
+        try:
+            ground_truth = normalize_ground_truth(gold)
+            normalized.append((mathd_normalize_answer(ground_truth), normalize_answer(ground_truth)))
+        except Exception:
+            # Be robust to parser failures on individual labels.
+            continue
+    return normalized
+
+
+def index_key(label: Any) -> Optional[Hashable]:
+    """In-memory key of `label`: the string itself, or a tuple of alternatives; `None` if unusable."""
+
+    if isinstance(label, str):
+        return label
+    if isinstance(label, (list, tuple)) and all(isinstance(item, str) for item in label):
+        return tuple(label)
+    return None
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class LabelIndex:
+    """Normalized label forms in a plain dict keyed by the label itself."""
+
+    def __init__(self, labels: Dict[Hashable, List[NormalizedLabel]]) -> None:
+        self.labels = labels
+        self._stats: Counter = Counter()
+
+    @classmethod
+    def build(cls, records: Iterable[Mapping[str, Any]], *, label_key: str = "label") -> "LabelIndex":
+        labels: Dict[Hashable, List[NormalizedLabel]] = {}
+        for record in records:
+            label = record.get(label_key)
+            key = index_key(label)
+            if key is None or key in labels:
+                continue
+            labels[key] = normalize_labels(candidate_labels(label))
+        return cls(labels)
+
+    @classmethod
+    def load(cls, path: str) -> "LabelIndex":
+        with _open(path, "r") as handle:
+            payload = json.load(handle)
+        if payload.get("format") != LABEL_INDEX_FORMAT_VERSION:
+            raise ValueError(f"Label index {path!r} has format {payload.get('format')!r}, "
+                             f"expected {LABEL_INDEX_FORMAT_VERSION}; rebuild it.")
+        labels = {index_key(label): [tuple(form) for form in forms] for label, forms in payload["labels"]}
+        return cls(labels)
+
+    def save(self, path: str) -> None:
+        entries = [[list(key) if isinstance(key, tuple) else key, forms] for key, forms in self.labels.items()]
+        payload = {"format": LABEL_INDEX_FORMAT_VERSION, "labels": entries}
+        with _open(path, "w") as handle:
+            json.dump(payload, handle, ensure_ascii=False, separators=(",", ":"))
+
+    def lookup(self, label: Any) -> Optional[List[NormalizedLabel]]:
+        """Precomputed forms of `label`, or `None` when the index has not seen it."""
+
+        forms = self.labels.get(label) if isinstance(label, str) else self.labels.get(index_key(label))
+        self._stats["hits" if forms is not None else "misses"] += 1
+        return forms
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def stats(self) -> Dict[str, int]:
+        return {"labels": len(self.labels), **self._stats}
+
+
+_INDEX_CACHE: Dict[str, LabelIndex] = {}
+_INDEX_CACHE_LOCK = threading.Lock()
+
+
+def load_label_index(path: str) -> LabelIndex:
+    """Open `path` once per process and reuse it across reward instances."""
+
+    key = os.path.realpath(path)
+    with _INDEX_CACHE_LOCK:
+        index = _INDEX_CACHE.get(key)
+        if index is None:
+            index = _INDEX_CACHE[key] = LabelIndex.load(key)
+        return index
+
@@ -2,12 +2,30 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Optional, Sequence
+import asyncio
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, Dict, FrozenSet, List, Optional, Tuple
 
+from openrlhf_agent.utils.cache import LRUCache
 from openrlhf_agent.utils.types import Action, RewardSample
-from openrlhf_agent.agentkit.rewards.result_rewards.base import ResultRewardStrategy
-from openrlhf_agent.agentkit.rewards.result_rewards.hub.math_utils import grade_answer_verl
+from openrlhf_agent.agentkit.rewards.result_rewards.base import ResultRewardStrategy, TransientScore
+from openrlhf_agent.agentkit.rewards.result_rewards.hub.label_index import (
+    LabelIndex,
+    NormalizedLabel,
+    candidate_labels,
+    load_label_index,
+    normalize_labels,
+)
+from openrlhf_agent.agentkit.rewards.result_rewards.hub.math_grading import SympyGradingPool
+from openrlhf_agent.agentkit.rewards.result_rewards.hub.math_utils import (
+    extract_answer,
+    grade_normalized_tiered,
+    mathd_normalize_answer,
+    normalize_answer,
+    normalization_cache_info,
+)
 
 
 @dataclass
@@ -46,29 +64,206 @@ class MatchingReward(ResultRewardStrategy):
         return self.score_response(final_response, label)
 
 
+class _TimedOut(float):
+    """Grade-cache marker of a pair whose sympy grading timed out; the value is when to retry it."""
+
+# (answer MathD form, answer sympy form, normalized labels) of one sample.
+_PreparedSample = Tuple[Optional[str], Optional[str], List[NormalizedLabel]]
+
+
 @dataclass
 class MathMatchingReward(MatchingReward):
-    """Matching reward that also checks symbolic math equivalence for boxed LaTeX answers."""
+    """Matching reward that also checks symbolic math equivalence for boxed LaTeX answers.
+
+    `score` keeps the MathD string check and the pure-Python tiers of `grade_normalized_tiered`
+    (exact, structural, numeric) in-process and sends the sympy tiers to a process pool, where an
+    item slower than `sympy_timeout` seconds is killed and scored as a miss. Set
+    `sympy_timeout=None` to grade inline as before. `close()` stops the pool's workers, which are
+    otherwise stopped at exit.
+
+    Normalized answers are memoized in `math_utils`, and sympy verdicts are cached per
+    (normalized answer, normalized label) pair, so the n samples of a prompt pay for each
+    distinct comparison once. A timed-out pair scores as a miss without another attempt for
+    `sympy_retry_after` seconds, then is graded again; those misses are `TransientScore`s so that
+    persistent caches do not keep them.
+
+    `label_index` points at a file built by `scripts/build_label_index.py` for the training set; labels found
+    there skip unboxing and normalization entirely, others are normalized as usual.
+    """
+
+    NON_SCORING_FIELDS: ClassVar[FrozenSet[str]] = frozenset(
+        {
+            "sympy_timeout", "sympy_retry_after", "sympy_workers", "sympy_max_tasks_per_worker",
+            "grade_cache_size", "label_index",
+        }
+    )
+
+    sympy_timeout: Optional[float] = 5.0
+    sympy_retry_after: float = 60.0
+    sympy_workers: int = 4
+    sympy_max_tasks_per_worker: int = 500
+    grade_cache_size: int = 100_000
+    label_index: Optional[str] = None
+
+    _label_index: Optional[LabelIndex] = field(default=None, init=False, repr=False, compare=False)
+    _grading_pool: Optional[SympyGradingPool] = field(default=None, init=False, repr=False, compare=False)
+    _grade_cache: Optional[LRUCache] = field(default=None, init=False, repr=False, compare=False)
+    _tiers: Counter = field(default_factory=Counter, init=False, repr=False, compare=False)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Worker processes and the lock-guarded cache stay with the instance that created them.
+        state = self.__dict__.copy()
+        state["_grading_pool"] = None
+        state["_grade_cache"] = None
+        state["_label_index"] = None
+        return state
+
+    def _label_forms(self, label: Any) -> List[NormalizedLabel]:
+        if self.label_index is not None:
+            if self._label_index is None:
+                self._label_index = load_label_index(self.label_index)
+            forms = self._label_index.lookup(label)
+            if forms is not None:
+                return forms
+        return normalize_labels(candidate_labels(label))
+
+    def _get_grading_pool(self) -> SympyGradingPool:
+        if self._grading_pool is None:
+            self._grading_pool = SympyGradingPool(
+                num_workers=self.sympy_workers,
+                timeout=self.sympy_timeout,
+                max_tasks_per_worker=self.sympy_max_tasks_per_worker,
+            )
+        return self._grading_pool
+
+    def close(self) -> None:
+        """Shut down the grading worker processes; the next async grade starts a new pool."""
+
+        if self._grading_pool is not None:
+            self._grading_pool.close()
+            self._grading_pool = None
+
+    def _get_grade_cache(self) -> LRUCache:
+        if self._grade_cache is None:
+            self._grade_cache = LRUCache(self.grade_cache_size)
+        return self._grade_cache
+
+    def _prepare(self, response: str, label: Any) -> Optional[_PreparedSample]:
+        """Normalize the boxed answer and the labels, or return `None` when nothing can match."""
+
+        labels = self._label_forms(label)
+        given_answer = extract_answer(response.strip())
+        if given_answer is None or not labels:
+            return None
+        try:
+            return mathd_normalize_answer(given_answer), normalize_answer(given_answer), labels
+        except Exception:
+            return None
 
     def score_response(self, response: str, label: Optional[Any]) -> float:
-        if label is None:
-            raise NotImplementedError("label=None is not supported.")
-
-        candidate_labels: Sequence[str]
-        if isinstance(label, str):
-            candidate_labels = [label]
-        elif isinstance(label, Sequence):
-            candidate_labels = list(label)
-        else:
-            raise NotImplementedError(f"Unsupported label type: {type(label)!r}")
-    
-        response_text = response.strip()
-        for gold_label in candidate_labels:
-            try:
-                if grade_answer_verl(response_text, gold_label):
-                    return self.correct_score
-            except Exception:
-                # Be robust to parser/sympy failures on individual labels.
-                continue
+        prepared = self._prepare(response, label)
+        if prepared is None:
+            return self.miss_score
+
+        given_mathd, given_normalized, labels = prepared
+        if any(mathd_label == given_mathd for mathd_label, _ in labels):
+            self._tiers["mathd"] += 1
+            return self.correct_score
+
+        cache = self._get_grade_cache()
+        for _, sympy_label in labels:
+            key = (given_normalized, sympy_label)
+            verdict = cache.get(key)
+            if verdict is None or isinstance(verdict, _TimedOut):
+                try:
+                    verdict, tier = grade_normalized_tiered(given_normalized, sympy_label)
+                except Exception:
+                    # Be robust to parser/sympy failures on individual labels.
+                    verdict, tier = False, "error"
+                self._tiers[tier] += 1
+                cache.set(key, verdict)
+            if verdict:
+                return self.correct_score
 
         return self.miss_score
+
+    async def score_response_async(self, response: str, label: Optional[Any]) -> float:
+        """Same verdict as `score_response`, with sympy work off the event loop and time-limited."""
+
+        if self.sympy_timeout is None:
+            return self.score_response(response, label)
+
+        prepared = self._prepare(response, label)
+        if prepared is None:
+            return self.miss_score
+
+        given_mathd, given_normalized, labels = prepared
+        if any(mathd_label == given_mathd for mathd_label, _ in labels):
+            self._tiers["mathd"] += 1
+            return self.correct_score
+
+        cache = self._get_grade_cache()
+        pending = []
+        timed_out = False
+        for _, sympy_label in labels:
+            key = (given_normalized, sympy_label)
+            verdict = cache.get(key)
+            if isinstance(verdict, _TimedOut):
+                if verdict > time.monotonic():
+                    timed_out = True
+                    continue
+                verdict = None
+            if verdict is None:
+                verdict, tier = grade_normalized_tiered(*key, cheap_only=True)
+                if verdict is None:
+                    pending.append(key)
+                    continue
+                self._tiers[tier] += 1
+                cache.set(key, verdict)
+            if verdict:
+                return self.correct_score
+
+        if pending:
+            pool = self._get_grading_pool()
+            graded = await asyncio.gather(*(pool.grade(*key) for key in pending))
+            retry_at = _TimedOut(time.monotonic() + self.sympy_retry_after)
+            for key, verdict in zip(pending, graded):
+                # `None` (timeout / crashed worker) counts as a miss until `retry_at`.
+                cache.set(key, retry_at if verdict is None else bool(verdict))
+            if any(graded):
+                return self.correct_score
+            timed_out = timed_out or any(verdict is None for verdict in graded)
+
+        return TransientScore(self.miss_score) if timed_out else self.miss_score
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Normalization, grade-cache and label-index counters, deciding-tier counts and pool counters."""
+
+        tiers = Counter(self._tiers)
+        stats: Dict[str, Any] = {
+            "normalize": normalization_cache_info(),
+            "grades": self._get_grade_cache().stats(),
+        }
+        if self._grading_pool is not None:
+            stats["pool"] = self._grading_pool.stats()
+            tiers.update(stats["pool"]["tiers"])
+        stats["tiers"] = dict(tiers)
+        if self._label_index is not None:
+            stats["label_index"] = self._label_index.stats()
+        return stats
+
+    async def score(
+        self,
+        *,
+        action: Action,
+        label: Optional[Any],
+        sample: Optional[RewardSample] = None,
+    ) -> float:
+        if label is None:
+            return self.miss_score
+
+        final_response = self.extract_final_response(action)
+        if not final_response:
+            return self.miss_score
+
+        return await self.score_response_async(final_response, label)
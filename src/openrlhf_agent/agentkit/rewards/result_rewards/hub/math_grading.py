@@ -0,0 +1,189 @@
+"""Sandboxed process pool for sympy-based math grading.
+
+The sympy tiers of `grade_normalized_tiered` parse and simplify model output; pathological
+answers can take seconds or never return. Running it on the event loop stalls every concurrent rollout, and
+a thread cannot be interrupted, so the work runs in warm worker processes instead:
+
+- each pool thread owns one worker process and feeds it one item at a time;
+- an item that exceeds `timeout` gets its worker killed and replaced, and grades as a miss;
+- workers are recycled after `max_tasks_per_worker` items to cap sympy cache growth;
+- a worker that cannot be started grades its item as a miss instead of raising;
+- the pool shuts its workers down on `close()`, when it is garbage-collected, or at exit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing as mp
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _grading_worker(conn: Any) -> None:
+    from openrlhf_agent.agentkit.rewards.result_rewards.hub.math_utils import grade_normalized_tiered
+
+    conn.send("ready")
+    while True:
+        try:
+            item = conn.recv()
+        except EOFError:
+            return
+        if item is None:
+            return
+
+        given_normalized, ground_truth_normalized = item
+        try:
+            verdict, tier = grade_normalized_tiered(given_normalized, ground_truth_normalized)
+            result = (bool(verdict), tier)
+        except Exception:
+            result = (False, "error")
+        conn.send(result)
+
+
+class _WorkerProcess:
+    """One grading process plus the pipe used to talk to it."""
+
+    def __init__(self, ctx: Any, startup_timeout: float) -> None:
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_grading_worker, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+        # Wait for the imports to finish so startup never counts against an item's timeout.
+        if not self.conn.poll(startup_timeout) or self.conn.recv() != "ready":
+            self.kill()
+            raise RuntimeError("math grading worker failed to start")
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def _shutdown(executor: ThreadPoolExecutor, workers: list, lock: threading.Lock, wait: bool) -> None:
+    # A garbage-collected pool may be finalized on one of its own threads, which cannot be joined.
+    executor.shutdown(wait=wait)
+    with lock:
+        retiring = list(workers)
+        workers.clear()
+    for worker in retiring:
+        worker.close()
+
+
+class SympyGradingPool:
+    """Grade normalized (answer, ground truth) pairs with `grade_normalized_tiered` in worker processes.
+
+    Callers normalize with `math_utils.normalize_answer` first, so the memoized normal forms are
+    shared across workers and only the comparison crosses the pipe. `stats()` counts the tier that decided each item.
+    """
+
+    def __init__(
+        self,
+        *,
+        num_workers: int = 4,
+        timeout: float = 5.0,
+        max_tasks_per_worker: int = 500,
+        startup_timeout: float = 60.0,
+        start_method: str = "spawn",
+    ) -> None:
+        self.num_workers = int(num_workers)
+        self.timeout = float(timeout)
+        self.max_tasks_per_worker = int(max_tasks_per_worker)
+        self.startup_timeout = float(startup_timeout)
+
+        self._ctx = mp.get_context(start_method)
+        self._executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="math-grader")
+        self._local = threading.local()
+        self._workers: list[_WorkerProcess] = []
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"graded": 0, "timeouts": 0, "recycled": 0, "spawn_failures": 0}
+        self._tiers: Counter = Counter()
+        self._finalizer = weakref.finalize(self, _shutdown, self._executor, self._workers, self._lock, False)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "tiers": dict(self._tiers)}
+
+    def _spawn(self) -> _WorkerProcess:
+        worker = _WorkerProcess(self._ctx, self.startup_timeout)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _retire(self, worker: _WorkerProcess, *, kill: bool) -> None:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.close()
+        self._local.worker = None
+
+    def _grade_blocking(self, given_normalized: str, ground_truth_normalized: str) -> Optional[bool]:
+        worker = getattr(self._local, "worker", None)
+        if worker is not None and worker.tasks >= self.max_tasks_per_worker:
+            self._retire(worker, kill=False)
+            self._count("recycled")
+            worker = None
+        if worker is None:
+            try:
+                worker = self._local.worker = self._spawn()
+            except Exception as exc:
+                # Out of memory or file descriptors: a transient miss, like a crashed worker.
+                self._count("spawn_failures")
+                logger.warning("Math grading worker failed to start: %s", exc)
+                return None
+
+        worker.tasks += 1
+        try:
+            worker.conn.send((given_normalized, ground_truth_normalized))
+            if worker.conn.poll(self.timeout):
+                result, tier = worker.conn.recv()
+                with self._lock:
+                    self._stats["graded"] += 1
+                    self._tiers[tier] += 1
+                return result
+        except (EOFError, OSError):
+            # The worker died mid-item (e.g. killed by the OOM killer): treat like a timeout.
+            pass
+
+        self._retire(worker, kill=True)
+        self._count("timeouts")
+        logger.warning("Math grading timed out after %.1fs for answer %.80r", self.timeout, given_normalized)
+        return None
+
+    async def grade(self, given_normalized: str, ground_truth_normalized: str) -> Optional[bool]:
+        """Return the sympy verdict, or `None` when grading timed out or crashed."""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._grade_blocking, given_normalized, ground_truth_normalized
+        )
+
+    def close(self) -> None:
+        if self._finalizer.detach() is not None:
+            _shutdown(self._executor, self._workers, self._lock, True)
@@ -5,13 +5,21 @@ Based on https://github.com/agentica-project/deepscaler/blob/e6080ccd974eb64bd34
 
 from __future__ import annotations
 
+import cmath
 import re
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 
 import sympy
 from pylatexenc import latex2text
 from sympy.parsing import sympy_parser
 
+# n samples per prompt repeat the same answers and labels, so normalized forms are memoized.
+NORMALIZE_CACHE_SIZE = 65_536
 
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def mathd_normalize_answer(answer: str | None) -> str | None:
     """Normalize answers following the MathD ruleset."""
 
@@ -284,6 +292,13 @@ def _normalize(expr: str | None) -> str | None:
     return expr
 
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_answer(expr: str | None) -> str | None:
+    """Memoized `_normalize`."""
+
+    return _normalize(expr)
+
+
 def count_unknown_letters_in_expr(expr: str) -> int:
     expr = expr.replace("sqrt", "")
     expr = expr.replace("frac", "")
@@ -385,8 +400,15 @@ def extract_boxed_answer(solution: str) -> str | None:
 
 
 def grade_answer_sympy(given_answer: str, ground_truth: str) -> bool:
-    ground_truth_normalized = _normalize(ground_truth)
-    given_normalized = _normalize(given_answer)
+    return grade_normalized_sympy(normalize_answer(given_answer), normalize_answer(ground_truth))
+
+
+def grade_answer_tiered(given_answer: str, ground_truth: str) -> bool:
+    return bool(grade_normalized_tiered(normalize_answer(given_answer), normalize_answer(ground_truth))[0])
+
+
+def grade_normalized_sympy(given_normalized: str | None, ground_truth_normalized: str | None) -> bool:
+    """Sympy equivalence check on answers that already went through `normalize_answer`."""
 
     if ground_truth_normalized is None:
         return False
@@ -421,6 +443,160 @@ def grade_answer_sympy(given_answer: str, ground_truth: str) -> bool:
     return is_correct
 
 
+# Tiers of `grade_normalized_tiered`, cheapest first.
+GRADE_TIERS = ("exact", "structure", "numeric", "canonical", "sampled", "sympy")
+_SAMPLE_POINTS = (-1.7, -0.6, 0.43, 1.31, 2.9)
+_DECIMAL_RE = re.compile(r"^-?(\d+\.?\d*|\.\d+)$")
+_RATIO_RE = re.compile(r"^-?\d+/\d+$")
+
+
+def _parse_number(expr: str) -> Fraction | None:
+    if _DECIMAL_RE.match(expr):
+        return Fraction(expr)
+    if _RATIO_RE.match(expr):
+        numerator, denominator = expr.split("/")
+        if int(denominator) != 0:
+            return Fraction(int(numerator), int(denominator))
+    return None
+
+
+def _numeric_equal(ground_truth_elem: str, given_elem: str) -> Optional[bool]:
+    """Compare plain integers, fractions and decimals exactly; `None` when either is not one."""
+
+    ground_truth_value = _parse_number(ground_truth_elem)
+    given_value = _parse_number(given_elem)
+    if ground_truth_value is None or given_value is None:
+        return None
+    if ground_truth_value == given_value:
+        return True
+    if "." not in ground_truth_elem and "." not in given_elem:
+        return False
+
+    # sympy compares decimals as 53-bit floats, so near-equal values are left to it.
+    scale = max(1, abs(ground_truth_value), abs(given_value))
+    if abs(ground_truth_value - given_value) > scale * Fraction(1, 10**12):
+        return False
+    return None
+
+
+def _sampled_equal(ground_truth_elem: str, given_elem: str) -> Tuple[Optional[bool], str]:
+    """Compare parsed expressions structurally, then at sample points if they have at most one variable.
+
+    Sample points only ever reject: values that agree within tolerance can still differ (a large
+    offset, a tiny constant), so agreement is confirmed by expanding the exact difference to zero
+    and is otherwise left to the sympy tier.
+    """
+
+    try:
+        ground_truth_expr = _sympy_parse(ground_truth_elem)
+        given_expr = _sympy_parse(given_elem)
+    except Exception:
+        return None, "sampled"
+    if not isinstance(ground_truth_expr, sympy.Expr) or not isinstance(given_expr, sympy.Expr):
+        return None, "sampled"
+    if ground_truth_expr == given_expr:
+        return True, "canonical"
+
+    symbols = ground_truth_expr.free_symbols | given_expr.free_symbols
+    if len(symbols) > 1:
+        return None, "sampled"
+    # With floats sympy's verdict depends on rounding, so only a clear difference is decided here.
+    has_float = ground_truth_expr.has(sympy.Float) or given_expr.has(sympy.Float)
+    tolerance = 1e-6 if has_float else 1e-9
+
+    for point in _SAMPLE_POINTS if symbols else _SAMPLE_POINTS[:1]:
+        subs = {symbol: point for symbol in symbols}
+        try:
+            ground_truth_value = complex(ground_truth_expr.evalf(subs=subs))
+            given_value = complex(given_expr.evalf(subs=subs))
+        except Exception:
+            return None, "sampled"
+        if not (cmath.isfinite(ground_truth_value) and cmath.isfinite(given_value)):
+            return None, "sampled"
+        if abs(ground_truth_value - given_value) > tolerance * max(1.0, abs(ground_truth_value), abs(given_value)):
+            return False, "sampled"
+    if has_float:
+        return None, "sampled"
+    try:
+        if sympy.expand(ground_truth_expr - given_expr) == 0:
+            return True, "sampled"
+    except Exception:
+        pass
+    return None, "sampled"
+
+
+def _equal_tiered(ground_truth_elem: str, given_elem: str, cheap_only: bool) -> Tuple[Optional[bool], str]:
+    if not should_allow_eval(f"({ground_truth_elem})-({given_elem})"):
+        # `are_equal_under_sympy` refuses these too.
+        return False, "structure"
+
+    verdict = _numeric_equal(ground_truth_elem, given_elem)
+    if verdict is not None:
+        return verdict, "numeric"
+    if cheap_only:
+        return None, "numeric"
+
+    verdict, tier = _sampled_equal(ground_truth_elem, given_elem)
+    if verdict is not None:
+        return verdict, tier
+    return are_equal_under_sympy(ground_truth_elem, given_elem), "sympy"
+
+
+def grade_normalized_tiered(
+    given_normalized: str | None,
+    ground_truth_normalized: str | None,
+    *,
+    cheap_only: bool = False,
+) -> Tuple[Optional[bool], str]:
+    """`grade_normalized_sympy` with cheap checks in front of full sympy simplification.
+
+    Each element pair goes through exact string and structural rules, exact numeric comparison
+    of integers, fractions and decimals, structural equality of the parsed expressions, evaluation
+    at sample points for single-variable expressions (to reject; agreement must also expand to an
+    exact zero difference), and only then `are_equal_under_sympy`.
+    Returns the verdict and the most expensive tier that was needed. With `cheap_only`, sympy is
+    never touched and the verdict is `None` when the pure-Python tiers were inconclusive.
+    """
+
+    if ground_truth_normalized is None:
+        return False, "exact"
+
+    if ground_truth_normalized == given_normalized:
+        return True, "exact"
+
+    if not given_normalized:
+        return False, "exact"
+
+    ground_truth_elems = split_tuple(ground_truth_normalized)
+    given_elems = split_tuple(given_normalized)
+
+    if len(ground_truth_elems) > 1 and (
+        ground_truth_normalized[0] != given_normalized[0] or ground_truth_normalized[-1] != given_normalized[-1]
+    ):
+        return False, "structure"
+    if len(ground_truth_elems) != len(given_elems):
+        return False, "structure"
+
+    tier = "structure"
+    undecided = False
+    for ground_truth_elem, given_elem in zip(ground_truth_elems, given_elems, strict=False):
+        if _is_frac(ground_truth_elem) and _is_frac(given_elem):
+            verdict, elem_tier = ground_truth_elem == given_elem, "structure"
+        elif _str_is_int(ground_truth_elem) != _str_is_int(given_elem):
+            verdict, elem_tier = False, "structure"
+        else:
+            verdict, elem_tier = _equal_tiered(ground_truth_elem, given_elem, cheap_only)
+
+        if GRADE_TIERS.index(elem_tier) > GRADE_TIERS.index(tier):
+            tier = elem_tier
+        if verdict is None:
+            undecided = True
+        elif not verdict:
+            return False, tier
+
+    return (None if undecided else True), tier
+
+
 def grade_answer_mathd(given_answer: str, ground_truth: str) -> bool:
     ground_truth_normalized_mathd = mathd_normalize_answer(ground_truth)
     given_answer_normalized_mathd = mathd_normalize_answer(given_answer)
@@ -434,13 +610,35 @@ def extract_answer(passage: str) -> str | None:
     return None
 
 
+def normalize_ground_truth(ground_truth: object) -> str:
+    """Return the label as a string, unwrapping a \\boxed{} answer if present."""
+
+    return _unbox_label(str(ground_truth))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _unbox_label(ground_truth: str) -> str:
+    if "\\boxed" in ground_truth:
+        ground_truth = extract_answer(ground_truth) or ground_truth
+    return ground_truth
+
+
+def normalization_cache_info() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counters of the memoized normalizers."""
+
+    caches = {
+        "normalize_answer": normalize_answer,
+        "mathd_normalize_answer": mathd_normalize_answer,
+        "ground_truth": _unbox_label,
+    }
+    return {name: func.cache_info()._asdict() for name, func in caches.items()}
+
+
 def grade_answer_verl(solution_str: str, ground_truth: str) -> bool:
     if ground_truth is None:
         return False
 
-    ground_truth = str(ground_truth)
-    if "\\boxed" in ground_truth:
-        ground_truth = extract_answer(ground_truth) or ground_truth
+    ground_truth = normalize_ground_truth(ground_truth)
 
     given_answer = extract_answer(solution_str)
     if given_answer is None:
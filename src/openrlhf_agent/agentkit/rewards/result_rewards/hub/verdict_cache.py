@@ -0,0 +1,186 @@
+"""Verdict cache for judge-scored rewards.
+
+Identical (question, label, response) triples recur across samples and epochs. Verdicts are kept
+in a process-wide in-memory LRU, optionally backed by a `SQLiteKVStore` that survives restarts
+and is shared by every process on the node, and concurrent lookups of the same key share one
+judge call (single flight). Transient failures (`None`, `TransientScore`) are never cached.
+Callers build keys with `make_cache_key` over everything that can change a verdict: judge model,
+prompt template and scoring mode plus the triple itself.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from openrlhf_agent.utils.cache import LRUCache, SQLiteKVStore
+from openrlhf_agent.agentkit.rewards.result_rewards.base import TransientScore
+
+_SHARED_CACHES: Dict[Tuple[Any, ...], "VerdictCache"] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+class VerdictCache:
+    """Two-level verdict cache with single-flight deduplication of concurrent misses."""
+
+    def __init__(self, *, max_entries: int = 100_000, store: Optional[SQLiteKVStore] = None) -> None:
+        self.memory = LRUCache(max_entries)
+        self.store = store
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._stats: Counter = Counter()
+
+    @classmethod
+    def shared(cls, *, max_entries: int = 100_000, store: Optional[SQLiteKVStore] = None) -> "VerdictCache":
+        """Return the process-wide cache for `store` (or the memory-only one), creating it on first use."""
+
+        key = (store.path, store.namespace) if store is not None else None
+        with _SHARED_LOCK:
+            cache = _SHARED_CACHES.get(key)
+            if cache is None:
+                cache = _SHARED_CACHES[key] = cls(max_entries=max_entries, store=store)
+            return cache
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        """Return the cached value for `key`, or run `compute` once for all concurrent callers.
+
+        `None` results (judge failures) and `TransientScore`s are returned but never cached.
+        """
+
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._stats["deduplicated"] += 1
+        else:
+            # The computation runs in its own task: a caller that is cancelled stops waiting, but
+            # the judge call carries on for every other caller waiting on the same key.
+            task = asyncio.ensure_future(self._load_or_compute(key, compute))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    async def get_or_compute_many(
+        self, keys: Sequence[str], compute_many: Callable[[List[str]], Awaitable[Sequence[Optional[Any]]]]
+    ) -> List[Optional[Any]]:
+        """Batch form of `get_or_compute`, returning values in `keys` order.
+
+        Hits are looked up with one store query; the distinct misses no other caller is computing
+        go to a single `compute_many` call, and each is registered in flight like a single miss.
+        """
+
+        found = await self.get_many(keys)
+        tasks: Dict[str, asyncio.Future] = {}
+        own: List[str] = []
+        for key in dict.fromkeys(keys):
+            if key in found:
+                continue
+            task = self._in_flight.get(key)
+            if task is not None:
+                self._stats["deduplicated"] += 1
+                tasks[key] = task
+            else:
+                own.append(key)
+
+        if own:
+            batch = asyncio.ensure_future(self._compute_many(own, compute_many))
+            for position, key in enumerate(own):
+                task = asyncio.ensure_future(self._pick(batch, position))
+                self._in_flight[key] = task
+                task.add_done_callback(functools.partial(self._finish, key))
+                tasks[key] = task
+
+        if tasks:
+            values = await asyncio.shield(asyncio.gather(*tasks.values()))
+            found.update(zip(tasks, values))
+        return [found.get(key) for key in keys]
+
+    @staticmethod
+    async def _pick(batch: asyncio.Future, position: int) -> Optional[Any]:
+        return (await batch)[position]
+
+    async def _compute_many(self, keys: List[str], compute_many) -> List[Optional[Any]]:
+        self._stats["computed"] += len(keys)
+        values = list(await compute_many(keys))
+        await self.put_many(dict(zip(keys, values)))
+        return values
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Waiters see the exception; keep "never retrieved" warnings out of the log.
+            task.exception()
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Look `key` up in memory, then in the store; `None` on a miss."""
+
+        value = self.memory.get(key)
+        if value is None:
+            value = await self._get_stored(key)
+        return value
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Values of the `keys` found in memory or, with one query, in the store."""
+
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            value = self.memory.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+
+        if missing and self.store is not None:
+            stored = await asyncio.to_thread(self.store.get_many, missing)
+            self._stats["store_hits"] += len(stored)
+            for key, value in stored.items():
+                self.memory.set(key, value)
+            found.update(stored)
+        return found
+
+    @staticmethod
+    def _cacheable(value: Any) -> bool:
+        return value is not None and not isinstance(value, TransientScore)
+
+    async def put(self, key: str, value: Any) -> None:
+        await self.put_many({key: value})
+
+    async def put_many(self, items: Mapping[str, Any]) -> None:
+        items = {key: value for key, value in items.items() if self._cacheable(value)}
+        for key, value in items.items():
+            self.memory.set(key, value)
+        if items and self.store is not None:
+            await asyncio.to_thread(self.store.set_many, items)
+
+    async def _get_stored(self, key: str) -> Optional[Any]:
+        if self.store is None:
+            return None
+        value = await asyncio.to_thread(self.store.get, key)
+        if value is not None:
+            self._stats["store_hits"] += 1
+            self.memory.set(key, value)
+        return value
+
+    async def _load_or_compute(self, key: str, compute: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        value = await self._get_stored(key)
+        if value is not None:
+            return value
+
+        self._stats["computed"] += 1
+        value = await compute()
+        await self.put(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "store_hits": self._stats["store_hits"],
+            "deduplicated": self._stats["deduplicated"],
+            "computed": self._stats["computed"],
+        }
@@ -71,6 +71,14 @@ class AgentSession:
             add_generation_prompt=True,
         )
 
+    def reward_sample(self) -> RewardSample:
+        """Reward context of the latest step: the initial question and the turns after it."""
+
+        return RewardSample(
+            question=self._initial_question,
+            process_messages=self.history.messages[len(self._initial_question):], # filter system + input
+        )
+
     async def step(
         self,
         action: Action,
@@ -124,10 +132,7 @@ class AgentSession:
                 action=action,
                 label=label,
                 done=done,
-                sample=RewardSample(
-                    question=self._initial_question,
-                    process_messages=self.history.messages[len(self._initial_question):], # filter system + input
-                ),
+                sample=self.reward_sample(),
             )
 
         return observation, reward
@@ -1,6 +1,7 @@
 """Tool abstractions plus built-in providers."""
 
 from .base import ToolBase
+from .hub.bm25_search import BM25SearchTool
 from .hub.commentary import CommentaryTool
 from .hub.final import FinalTool
 from .hub.local_search import LocalSearchTool
@@ -8,6 +9,7 @@ from .hub.think import ThinkTool
 
 __all__ = [
     "ToolBase",
+    "BM25SearchTool",
     "CommentaryTool",
     "FinalTool",
     "LocalSearchTool",
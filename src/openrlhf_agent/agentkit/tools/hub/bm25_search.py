@@ -0,0 +1,243 @@
+"""In-process BM25 search tool backed by a memory-mapped sparse index."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from openrlhf_agent.agentkit.tools.hub.local_search import LocalSearchTool
+from openrlhf_agent.utils.cache import SQLiteKVStore
+
+
+INDEX_FORMAT_VERSION = 1
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    """
+    a an and are as at be but by for if in into is it no not of on or such that the their then there these
+    they this to was will with
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokenizer shared by index building and querying."""
+
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def _iter_corpus(corpus_path: str) -> Iterator[str]:
+    """Yield passage contents from a Search-R1 style JSONL corpus."""
+
+    with open(corpus_path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            contents = record.get("contents")
+            if contents is None:
+                title = record.get("title") or ""
+                text = record.get("text") or ""
+                contents = f"{title}\n{text}" if title else text
+            yield str(contents)
+
+
+class BM25Index:
+    """Read-only BM25 index stored as flat NumPy arrays.
+
+    Postings are kept term-major (CSR layout) with the full BM25 term weight
+    precomputed, so a query is a gather over a handful of posting slices. All
+    arrays are opened with ``mmap_mode="r"`` and therefore shared through the
+    page cache by every process that loads the same index directory.
+    """
+
+    def __init__(self, index_path: str) -> None:
+        import numpy as np
+
+        self.index_path = index_path
+        with open(os.path.join(index_path, "meta.json"), "r", encoding="utf-8") as handle:
+            self.meta: Dict[str, Any] = json.load(handle)
+        if self.meta.get("format") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index format: {self.meta.get('format')!r}")
+
+        with open(os.path.join(index_path, "vocab.json"), "r", encoding="utf-8") as handle:
+            self._vocab: Dict[str, int] = {term: idx for idx, term in enumerate(json.load(handle))}
+
+        def _load(name: str):
+            return np.load(os.path.join(index_path, f"{name}.npy"), mmap_mode="r")
+
+        self._indptr = _load("postings_indptr")
+        self._doc_ids = _load("postings_docs")
+        self._weights = _load("postings_weights")
+        self._doc_offsets = _load("doc_offsets")
+        self._contents = np.memmap(os.path.join(index_path, "doc_contents.bin"), dtype=np.uint8, mode="r")
+
+    @property
+    def num_docs(self) -> int:
+        return int(self.meta["num_docs"])
+
+    @property
+    def fingerprint(self) -> str:
+        """Stable identifier for the index contents and scoring parameters."""
+
+        return str(self.meta["fingerprint"])
+
+    def search(self, query: str, topk: int) -> Tuple[List[int], List[float]]:
+        """Return the top-k document ids and BM25 scores for `query`."""
+
+        import numpy as np
+
+        term_ids = {self._vocab[token] for token in tokenize(query) if token in self._vocab}
+        if not term_ids or topk <= 0:
+            return [], []
+
+        slices = [slice(self._indptr[term_id], self._indptr[term_id + 1]) for term_id in sorted(term_ids)]
+        doc_ids = np.concatenate([self._doc_ids[span] for span in slices])
+        weights = np.concatenate([self._weights[span] for span in slices])
+
+        # Accumulate per-document scores over the matched postings only.
+        unique_docs, inverse = np.unique(doc_ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+
+        k = min(topk, unique_docs.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return unique_docs[top].tolist(), scores[top].tolist()
+
+    def documents(self, doc_ids: Sequence[int]) -> List[str]:
+        """Decode passage contents for the given document ids."""
+
+        results: List[str] = []
+        for doc_id in doc_ids:
+            start, end = int(self._doc_offsets[doc_id]), int(self._doc_offsets[doc_id + 1])
+            results.append(self._contents[start:end].tobytes().decode("utf-8"))
+        return results
+
+    @classmethod
+    def build(cls, corpus_path: str, index_path: str, *, k1: float = 0.9, b: float = 0.4) -> "BM25Index":
+        """Index a JSONL corpus and write the memory-mappable arrays to `index_path`."""
+
+        import hashlib
+
+        import numpy as np
+        from scipy import sparse
+
+        os.makedirs(index_path, exist_ok=True)
+
+        vocab: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        freqs: List[int] = []
+        doc_lengths: List[int] = []
+        doc_offsets = [0]
+        digest = hashlib.sha256(f"bm25:{k1}:{b}".encode("utf-8"))
+
+        with open(os.path.join(index_path, "doc_contents.bin"), "wb") as contents_file:
+            for doc_id, contents in enumerate(_iter_corpus(corpus_path)):
+                encoded = contents.encode("utf-8")
+                contents_file.write(encoded)
+                digest.update(encoded)
+                doc_offsets.append(doc_offsets[-1] + len(encoded))
+
+                counts = Counter(tokenize(contents))
+                doc_lengths.append(sum(counts.values()))
+                for token, count in counts.items():
+                    rows.append(vocab.setdefault(token, len(vocab)))
+                    cols.append(doc_id)
+                    freqs.append(count)
+
+        num_docs = len(doc_lengths)
+        if num_docs == 0:
+            raise ValueError(f"Corpus {corpus_path!r} contains no documents.")
+
+        lengths = np.asarray(doc_lengths, dtype=np.float32)
+        avgdl = float(lengths.mean()) or 1.0
+
+        postings = sparse.csr_matrix(
+            (np.asarray(freqs, dtype=np.float32), (np.asarray(rows), np.asarray(cols))),
+            shape=(len(vocab), num_docs),
+        )
+        postings.sort_indices()
+
+        doc_freq = np.diff(postings.indptr).astype(np.float32)
+        idf = np.log1p((num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        tf = postings.data
+        norm = k1 * (1.0 - b + b * lengths[postings.indices] / avgdl)
+        term_rows = np.repeat(np.arange(len(vocab)), np.diff(postings.indptr))
+        weights = idf[term_rows] * tf * (k1 + 1.0) / (tf + norm)
+
+        np.save(os.path.join(index_path, "postings_indptr.npy"), postings.indptr.astype(np.int64))
+        np.save(os.path.join(index_path, "postings_docs.npy"), postings.indices.astype(np.int32))
+        np.save(os.path.join(index_path, "postings_weights.npy"), weights.astype(np.float32))
+        np.save(os.path.join(index_path, "doc_offsets.npy"), np.asarray(doc_offsets, dtype=np.int64))
+
+        with open(os.path.join(index_path, "vocab.json"), "w", encoding="utf-8") as handle:
+            json.dump(sorted(vocab, key=vocab.__getitem__), handle, ensure_ascii=False)
+
+        meta = {
+            "format": INDEX_FORMAT_VERSION,
+            "k1": k1,
+            "b": b,
+            "num_docs": num_docs,
+            "num_terms": len(vocab),
+            "avgdl": avgdl,
+            "fingerprint": digest.hexdigest()[:16],
+        }
+        with open(os.path.join(index_path, "meta.json"), "w", encoding="utf-8") as handle:
+            json.dump(meta, handle, indent=2)
+
+        return cls(index_path)
+
+
+_INDEX_CACHE: Dict[str, BM25Index] = {}
+_INDEX_CACHE_LOCK = threading.Lock()
+
+
+def load_bm25_index(index_path: str) -> BM25Index:
+    """Open `index_path` once per process and reuse it across tool instances."""
+
+    key = os.path.realpath(index_path)
+    with _INDEX_CACHE_LOCK:
+        index = _INDEX_CACHE.get(key)
+        if index is None:
+            index = _INDEX_CACHE[key] = BM25Index(key)
+        return index
+
+
+class BM25SearchTool(LocalSearchTool):
+    """`local_search` served in-process from a BM25 index instead of the HTTP retriever."""
+
+    description = "Search a local BM25 index and return up to `topk` formatted passages."
+
+    def __init__(self, *, index_path: str, timeout: float = 10.0, cache: Optional[SQLiteKVStore] = None):
+        super().__init__(base_url=index_path, timeout=timeout, cache=cache)
+        self.index_path = index_path
+        self._index: Optional[BM25Index] = None
+
+    @property
+    def index(self) -> BM25Index:
+        if self._index is None:
+            self._index = load_bm25_index(self.index_path)
+        return self._index
+
+    @property
+    def retriever_fingerprint(self) -> str:
+        return f"bm25:{self.index.fingerprint}"
+
+    def _search(self, query: str, topk: int) -> List[Mapping[str, Any]]:
+        doc_ids, scores = self.index.search(query, topk)
+        contents = self.index.documents(doc_ids)
+        return [
+            {"document": {"id": doc_id, "contents": text}, "score": score}
+            for doc_id, text, score in zip(doc_ids, contents, scores)
+        ]
+
+    async def _retrieve(self, query: str, topk: int) -> Optional[Sequence[Mapping[str, Any]]]:
+        return await asyncio.to_thread(self._search, query, topk)
+
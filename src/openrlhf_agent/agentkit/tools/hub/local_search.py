@@ -2,9 +2,16 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, Mapping, Sequence
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Sequence
 
 from openrlhf_agent.agentkit.tools import ToolBase
+from openrlhf_agent.utils.cache import SQLiteKVStore, make_cache_key
+
+
+class RetrieverResponseError(ValueError):
+    """The retriever answered, but not in the expected format; the message is shown to the model."""
 
 
 class LocalSearchTool(ToolBase):
@@ -32,9 +39,34 @@ class LocalSearchTool(ToolBase):
         "required": ["query"],
     }
 
-    def __init__(self, *, base_url: str, timeout: float = 10.0):
+    def __init__(
+        self,
+        *,
+        base_url: str,
+        timeout: float = 10.0,
+        cache: Optional[SQLiteKVStore] = None,
+        retriever_fingerprint: Optional[str] = None,
+        compact: bool = False,
+        docs_url: Optional[str] = None,
+        doc_cache_size: int = 50_000,
+    ):
         self.retriever_url = base_url
         self.timeout = float(timeout)
+        self.cache = cache
+        self._retriever_fingerprint = retriever_fingerprint
+
+        # Compact mode: the server returns only doc ids + scores; contents come from the
+        # in-memory doc-id LRU below, and only unseen ids are fetched from `docs_url`.
+        self.compact = compact
+        self.docs_url = docs_url or f"{base_url.rstrip('/').rsplit('/', 1)[0]}/docs"
+        self.doc_cache_size = int(doc_cache_size)
+        self._doc_cache: OrderedDict[Any, str] = OrderedDict()
+
+    @property
+    def retriever_fingerprint(self) -> str:
+        """Identifies the index/encoder behind the results; part of every cache key."""
+
+        return self._retriever_fingerprint or self.retriever_url
 
     @classmethod
     def _parse_topk(cls, value: Any) -> int:
@@ -68,6 +100,86 @@ class LocalSearchTool(ToolBase):
 
         return "\n\n".join(blocks).strip()
 
+    async def _retrieve(self, query: str, topk: int) -> Optional[Sequence[Mapping[str, Any]]]:
+        """Fetch raw passages for one query; `None` means the retriever returned nothing."""
+
+        import httpx
+
+        request_payload = {"queries": [query], "topk": topk, "return_scores": True}
+        if self.compact:
+            request_payload["response_format"] = "compact"
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.post(self.retriever_url, json=request_payload)
+            response.raise_for_status()
+            response_data = response.json()
+            if self.compact:
+                return await self._resolve_compact(client, response_data)
+
+        results = response_data.get("result")
+        if not isinstance(results, list) or not results:
+            return None
+
+        # Server usually returns: {"result": [[...docs...]]} for one query
+        passages = results[0]
+        if not isinstance(passages, list):
+            raise RetrieverResponseError("Unexpected retriever response format: `result[0]` is not a list.")
+        return passages
+
+    async def _resolve_compact(self, client: Any, response_data: Mapping[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Turn a compact `{"ids", "scores"}` response into passages, fetching only uncached documents."""
+
+        ids = response_data.get("ids")
+        if not isinstance(ids, list) or not ids:
+            return None
+        doc_ids = ids[0]
+        doc_scores = (response_data.get("scores") or [[]])[0]
+        if not isinstance(doc_ids, list) or len(doc_scores) != len(doc_ids):
+            raise RetrieverResponseError("Unexpected retriever response format: `ids[0]` / `scores[0]` mismatch.")
+
+        resolved: Dict[Any, str] = {}
+        for doc_id in doc_ids:
+            if doc_id in self._doc_cache:
+                self._doc_cache.move_to_end(doc_id)
+                resolved[doc_id] = self._doc_cache[doc_id]
+
+        missing = [doc_id for doc_id in dict.fromkeys(doc_ids) if doc_id not in resolved]
+        if missing:
+            response = await client.post(self.docs_url, json={"ids": missing})
+            response.raise_for_status()
+            documents = response.json().get("documents")
+            if not isinstance(documents, list) or len(documents) != len(missing):
+                raise RetrieverResponseError(
+                    "Unexpected retriever response format: `documents` does not match the requested ids."
+                )
+            for doc_id, document in zip(missing, documents):
+                contents = str((document or {}).get("contents") or "")
+                resolved[doc_id] = contents
+                self._doc_cache[doc_id] = contents
+            while len(self._doc_cache) > self.doc_cache_size:
+                self._doc_cache.popitem(last=False)
+
+        return [
+            {"document": {"contents": resolved[doc_id]}, "score": score}
+            for doc_id, score in zip(doc_ids, doc_scores)
+        ]
+
+    async def _cached_retrieve(self, query: str, topk: int) -> Optional[Sequence[Mapping[str, Any]]]:
+        """Serve repeated searches from the persistent cache when one is attached."""
+
+        if self.cache is None:
+            return await self._retrieve(query, topk)
+
+        key = make_cache_key("local_search", self.retriever_fingerprint, query, topk)
+        passages = await asyncio.to_thread(self.cache.get, key)
+        if passages is not None:
+            return passages
+
+        passages = await self._retrieve(query, topk)
+        if passages:
+            await asyncio.to_thread(self.cache.set, key, list(passages))
+        return passages
+
     async def call(self, *, context: Dict[str, Any], arguments: Dict[str, Any]) -> str:
         import httpx
 
@@ -77,28 +189,18 @@ class LocalSearchTool(ToolBase):
 
         topk = self._parse_topk(arguments.get("topk"))
 
-        request_payload = {"queries": [query], "topk": topk, "return_scores": True}
-
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(self.retriever_url, json=request_payload)
-                response.raise_for_status()
-                response_data = response.json()
-
-            results = response_data.get("result")
-            if not isinstance(results, list) or not results:
-                return "No results returned by retriever."
-
-            # Server usually returns: {"result": [[...docs...]]} for one query
-            passages = results[0]
-            if not isinstance(passages, list):
-                return "Unexpected retriever response format: `result[0]` is not a list."
-
-            return self._format_passages(passages) or "No passages found."
-
+            passages = await self._cached_retrieve(query, topk)
         except httpx.TimeoutException:
             return f"Request timed out after {self.timeout:.1f}s."
         except httpx.HTTPStatusError as exc:
             return f"Request failed with HTTP {exc.response.status_code}."
+        except RetrieverResponseError as exc:
+            return str(exc)
         except Exception as exc:
             return f"Request failed: {exc}"
+
+        if passages is None:
+            return "No results returned by retriever."
+
+        return self._format_passages(passages) or "No passages found."
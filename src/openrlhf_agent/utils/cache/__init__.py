@@ -0,0 +1,10 @@
+"""Caching helpers shared by tools and reward strategies."""
+
+from .memory_lru import LRUCache
+from .sqlite_store import SQLiteKVStore, make_cache_key
+
+__all__ = [
+    "LRUCache",
+    "SQLiteKVStore",
+    "make_cache_key",
+]
@@ -0,0 +1,244 @@
+"""Size-bounded key/value store on top of SQLite, safe across threads and processes."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Hash arbitrary JSON-serializable parts into a fixed-size key."""
+
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteKVStore:
+    """Persistent JSON value cache with least-recently-used eviction.
+
+    The database runs in WAL mode and each thread (and each forked process) opens its own
+    connection. Reads do not write: access times of hits are buffered and flushed in one
+    transaction every `TOUCH_EVERY` hits (and before eviction), so recency is approximate and
+    readers in other processes rarely wait on the write lock. Entries are grouped by `namespace`
+    so several caches can share one file; `max_entries` and `max_bytes` are enforced per
+    namespace against running totals kept in the `totals` table, checked every `EVICT_EVERY`
+    writes.
+    """
+
+    EVICT_EVERY = 64
+    TOUCH_EVERY = 256
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        namespace: str = "default",
+        max_entries: Optional[int] = 100_000,
+        max_bytes: Optional[int] = None,
+        timeout: float = 30.0,
+    ) -> None:
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = float(timeout)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self._touched: Dict[str, float] = {}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        with self._transaction(conn):
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " accessed REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (namespace, accessed)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS totals ("
+                " namespace TEXT PRIMARY KEY, count INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+            )
+            exists = conn.execute("SELECT 1 FROM totals WHERE namespace = ?", (namespace,)).fetchone()
+            if exists is None:
+                # First open of this namespace (or a file from before totals were kept): count once.
+                conn.execute(
+                    "INSERT INTO totals (namespace, count, bytes)"
+                    " SELECT ?, COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?",
+                    (namespace, namespace),
+                )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self, conn: sqlite3.Connection):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for `key`, or `None` on a miss."""
+
+        row = self._connection().execute(
+            "SELECT value FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+
+        self._touch([key])
+        return json.loads(row[0])
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Return the cached values of `keys` that are present, in one query per 500 keys."""
+
+        conn = self._connection()
+        found: Dict[str, Any] = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):
+            chunk = unique[start : start + 500]
+            rows = conn.execute(
+                f"SELECT key, value FROM entries WHERE namespace = ? AND key IN ({', '.join('?' * len(chunk))})",
+                (self.namespace, *chunk),
+            ).fetchall()
+            found.update((key, json.loads(value)) for key, value in rows)
+        if found:
+            self._touch(list(found))
+        return found
+
+    def _touch(self, keys: Sequence[str]) -> None:
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                self._touched[key] = now
+            if len(self._touched) < self.TOUCH_EVERY:
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        """Write buffered access times of recent hits."""
+
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if not touched:
+            return
+        conn = self._connection()
+        with self._transaction(conn):
+            conn.executemany(
+                "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                [(accessed, self.namespace, key) for key, accessed in touched.items()],
+            )
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value, evicting old entries past the caps."""
+
+        self.set_many({key: value})
+
+    def set_many(self, items: Mapping[str, Any]) -> None:
+        """Store several values in one transaction."""
+
+        if not items:
+            return
+        now = time.time()
+        conn = self._connection()
+        added = delta_bytes = 0
+        with self._transaction(conn):
+            for key, value in items.items():
+                encoded = json.dumps(value, ensure_ascii=False)
+                previous = conn.execute(
+                    "SELECT size FROM entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, size, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, encoded, len(encoded), now),
+                )
+                added += 0 if previous else 1
+                delta_bytes += len(encoded) - (previous[0] if previous else 0)
+            conn.execute(
+                "UPDATE totals SET count = count + ?, bytes = bytes + ? WHERE namespace = ?",
+                (added, delta_bytes, self.namespace),
+            )
+
+        with self._lock:
+            self._writes_since_evict += len(items)
+            due = self._writes_since_evict >= self.EVICT_EVERY
+            if due:
+                self._writes_since_evict = 0
+        if due:
+            self.evict()
+
+    def _totals(self, conn: sqlite3.Connection) -> Tuple[int, int]:
+        row = conn.execute("SELECT count, bytes FROM totals WHERE namespace = ?", (self.namespace,)).fetchone()
+        return (int(row[0]), int(row[1])) if row is not None else (0, 0)
+
+    def evict(self) -> int:
+        """Drop least-recently-used entries until both caps hold; return the count removed."""
+
+        self.flush()
+        conn = self._connection()
+        with self._transaction(conn):
+            count, total = self._totals(conn)
+            excess = 0
+            if self.max_entries is not None and count > self.max_entries:
+                excess = count - self.max_entries
+            if self.max_bytes is not None and total > self.max_bytes:
+                # Estimate with the mean entry size; the next eviction pass corrects any shortfall.
+                mean_size = max(1, total // max(count, 1))
+                excess = max(excess, -(-(total - self.max_bytes) // mean_size))
+            if excess <= 0:
+                return 0
+
+            victims = conn.execute(
+                "SELECT key, size FROM entries WHERE namespace = ? ORDER BY accessed ASC LIMIT ?",
+                (self.namespace, excess),
+            ).fetchall()
+            conn.executemany(
+                "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                [(self.namespace, key) for key, _ in victims],
+            )
+            conn.execute(
+                "UPDATE totals SET count = count - ?, bytes = bytes - ? WHERE namespace = ?",
+                (len(victims), sum(size for _, size in victims), self.namespace),
+            )
+        return len(victims)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+        conn = self._connection()
+        with self._transaction(conn):
+            conn.execute("DELETE FROM entries WHERE namespace = ?", (self.namespace,))
+            conn.execute("UPDATE totals SET count = 0, bytes = 0 WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self) -> int:
+        return self._totals(self._connection())[0]
+
+
+__all__ = ["SQLiteKVStore", "make_cache_key"]